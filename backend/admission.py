@@ -0,0 +1,152 @@
+import asyncio
+import collections
+from typing import Any, Callable, Deque, Dict, Optional
+
+import orjson
+
+from metrics import registry
+
+admission_active = registry.gauge(
+    "admission_active_requests", "Requests holding an admission slot", ("route_class",)
+)
+admission_queued = registry.gauge(
+    "admission_queued_requests", "Requests waiting for an admission slot", ("route_class",)
+)
+admission_shed = registry.counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control", ("route_class", "reason")
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionBudget:
+    """Concurrency limit with a bounded FIFO wait queue for one route class.
+
+    A released slot is handed straight to the oldest waiter, so queued
+    requests cannot be overtaken by new arrivals.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float = 5.0, retry_after: int = 1):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = collections.Counter()
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self._admit()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._publish()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("timeout")
+        self.admitted += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over; active stays the same
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    def _admit(self) -> None:
+        self.active += 1
+        self.admitted += 1
+        self._publish()
+
+    def _reject(self, reason: str) -> None:
+        self.shed[reason] += 1
+        admission_shed.inc(self.name, reason)
+        raise Overloaded(reason)
+
+    def _publish(self) -> None:
+        admission_active.set(self.name, value=self.active)
+        admission_queued.set(self.name, value=len(self._waiters))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+
+class AdmissionMiddleware:
+    """Runs each request under its route class's budget, failing fast with
+    503 + Retry-After once that class's queue is full or the wait times out.
+
+    ``classify(method, path)`` names the budget to use; None bypasses
+    admission control (e.g. for metrics scrapes during an incident).
+    """
+
+    def __init__(self, app, budgets: Dict[str, AdmissionBudget], classify: Callable[[str, str], Optional[str]]):
+        self.app = app
+        self.budgets = budgets
+        self.classify = classify
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.budgets.get(self.classify(scope["method"], scope["path"]))
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await budget.acquire()
+        except Overloaded as e:
+            await self.reject(send, budget, e.reason)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
+
+    @staticmethod
+    async def reject(send, budget: AdmissionBudget, reason: str) -> None:
+        body = orjson.dumps({"detail": "Server is busy, please retry shortly", "reason": reason})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(budget.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
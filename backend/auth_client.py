@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class AuthServiceError(Exception):
+    pass
+
+
+class InvalidSession(AuthServiceError):
+    pass
+
+
+class AuthServiceUnavailable(AuthServiceError):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures and rejects calls for
+    ``cooldown`` seconds, then lets a single trial call through (half-open)."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until a trial call will be let through; 0 unless open."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def end_trial(self) -> None:
+        """Free the half-open slot when the trial ended without an outcome
+        (e.g. it was cancelled), so the next call can try again."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class AuthServiceClient:
+    """Async client for the auth provider's session-data endpoint.
+
+    Holds one keep-alive connection pool for the lifetime of the app; call
+    ``start`` on startup and ``close`` on shutdown.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None,
+        max_connections: int = 100,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections // 5 or 1,
+                ),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_session_data(self, session_id: str) -> Dict[str, Any]:
+        if self._client is None:
+            await self.start()
+        if not self.breaker.allow():
+            raise AuthServiceUnavailable("Auth service circuit is open")
+        # Only a half-open breaker lets a call through as its trial
+        trial = self.breaker.state == "half-open"
+
+        try:
+            last_error: Optional[Exception] = None
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    # Exponential backoff with jitter between attempts
+                    await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random()))
+                try:
+                    response = await self._client.get(self.url, headers={"X-Session-ID": session_id})
+                except httpx.HTTPError as e:
+                    last_error = e
+                    continue
+
+                if response.status_code >= 500:
+                    last_error = AuthServiceError(f"Auth service returned {response.status_code}")
+                    continue
+
+                # The upstream answered, so it is healthy even if the session is not
+                self.breaker.record_success()
+                if response.status_code != 200:
+                    raise InvalidSession(f"Auth service rejected session ({response.status_code})")
+                return response.json()
+
+            self.breaker.record_failure()
+            logger.warning(f"Auth service request failed after {self.retries + 1} attempts: {last_error}")
+            raise AuthServiceUnavailable(str(last_error))
+        finally:
+            # A cancelled or crashed trial must not hold the half-open slot forever
+            if trial:
+                self.breaker.end_trial()
@@ -0,0 +1,102 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+FORMATS = ("ndjson", "csv")
+
+
+class RecordError(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode(encoding)
+    if pending:
+        yield pending.rstrip(b"\r").decode(encoding)
+
+
+def _ends_quoted(line: str, quoted: bool) -> bool:
+    """Whether a CSV record is still inside a quoted field after ``line``.
+
+    Follows the csv module's default dialect: only a quote opening a field
+    starts quoting (so ``18" strand`` is plain text), and ``""`` inside a
+    quoted field is an escaped quote.
+    """
+    field_start = not quoted
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quoted:
+            if char == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 2
+                    continue
+                quoted = False
+        elif char == ",":
+            field_start = True
+            i += 1
+            continue
+        elif char == '"' and field_start:
+            quoted = True
+        field_start = False
+        i += 1
+    return quoted
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row number, record) pairs, where a record is a dict or a RecordError.
+
+    Row numbers count data rows from 1, so CSV headers are not counted.
+    """
+    if fmt == "ndjson":
+        row = 0
+        async for line in lines:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, RecordError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield row, RecordError("Each line must be a JSON object")
+                continue
+            yield row, record
+        return
+
+    header: List[str] = []
+    row = 0
+    pending = ""
+    quoted = False
+    async for line in lines:
+        pending = f"{pending}\n{line}" if pending else line
+        # A quoted field may span lines; wait until it is closed
+        quoted = _ends_quoted(line, quoted)
+        if quoted:
+            continue
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if not header:
+            header = [name.strip() for name in values]
+            continue
+
+        row += 1
+        if len(values) != len(header):
+            yield row, RecordError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells mean "not provided" so model defaults apply
+        record: Dict[str, Any] = {name: value for name, value in zip(header, values) if value != ""}
+        yield row, record
+
+    if pending:
+        yield row + 1, RecordError("Unterminated quoted field")
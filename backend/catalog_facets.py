@@ -0,0 +1,102 @@
+import bisect
+import itertools
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Attributes that can both be filtered on and counted
+FACET_FIELDS = ("category", "origin", "size")
+
+# Lower edges of the price histogram buckets; the last bucket is open-ended
+PRICE_BUCKET_EDGES = (0, 100, 250, 500, 1000, 2500, 5000)
+
+FilterKey = Tuple[Optional[str], ...]
+
+
+class _Aggregate:
+    __slots__ = ("total", "facets", "prices")
+
+    def __init__(self):
+        self.total = 0
+        self.facets: Dict[str, Counter] = {field: Counter() for field in FACET_FIELDS}
+        self.prices = [0] * len(PRICE_BUCKET_EDGES)
+
+
+class CatalogFacetIndex:
+    """Facet counts and price histograms for in-stock pearls, kept up to date
+    as pearls are written.
+
+    An aggregate is maintained for every combination of facet filters a pearl
+    matches (2 ** len(FACET_FIELDS) per pearl), so a facets request for any
+    filter is a dictionary lookup instead of a $group over the collection.
+    """
+
+    def __init__(self):
+        self._aggregates: Dict[FilterKey, _Aggregate] = {}
+        # What each counted pearl contributed, so it can be taken back out
+        self._entries: Dict[str, Tuple[Tuple[str, ...], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def rebuild(self, pearls: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for pearl in pearls:
+            self.add(pearl)
+
+    def add(self, pearl: Dict[str, Any]) -> None:
+        """Count a new pearl, or re-count one whose attributes or stock changed."""
+        self.remove(pearl["id"])
+        if not pearl.get("in_stock", True):
+            return
+
+        values = tuple(str(pearl.get(field) or "") for field in FACET_FIELDS)
+        bucket = max(0, bisect.bisect_right(PRICE_BUCKET_EDGES, pearl["price"]) - 1)
+        self._entries[pearl["id"]] = (values, bucket)
+        self._apply(values, bucket, 1)
+
+    def remove(self, pearl_id: str) -> None:
+        entry = self._entries.pop(pearl_id, None)
+        if entry is not None:
+            self._apply(*entry, -1)
+
+    def _apply(self, values: Tuple[str, ...], bucket: int, delta: int) -> None:
+        for mask in itertools.product((False, True), repeat=len(FACET_FIELDS)):
+            key = tuple(value if filtered else None for value, filtered in zip(values, mask))
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                aggregate = self._aggregates[key] = _Aggregate()
+
+            aggregate.total += delta
+            aggregate.prices[bucket] += delta
+            for field, value in zip(FACET_FIELDS, values):
+                if not value:
+                    continue
+                counts = aggregate.facets[field]
+                counts[value] += delta
+                if counts[value] <= 0:
+                    del counts[value]
+
+            if aggregate.total <= 0:
+                del self._aggregates[key]
+
+    def facets(self, **filters: Optional[str]) -> Dict[str, Any]:
+        """Counts for pearls matching every given facet filter (None = any)."""
+        key = tuple(filters.get(field) or None for field in FACET_FIELDS)
+        aggregate = self._aggregates.get(key) or _Aggregate()
+
+        price: List[Dict[str, Any]] = []
+        for index, count in enumerate(aggregate.prices):
+            upper = PRICE_BUCKET_EDGES[index + 1] if index + 1 < len(PRICE_BUCKET_EDGES) else None
+            price.append({"min": PRICE_BUCKET_EDGES[index], "max": upper, "count": count})
+
+        return {
+            "total": aggregate.total,
+            "facets": {
+                field: dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+                for field, counts in aggregate.facets.items()
+            },
+            "price": price,
+        }
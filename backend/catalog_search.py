@@ -0,0 +1,238 @@
+import bisect
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Field weights used when counting term frequency for a document
+FIELD_WEIGHTS = {"name": 3, "category": 2, "origin": 1, "description": 1}
+
+# Upper bound on vocabulary terms a trailing prefix may expand to
+MAX_PREFIX_EXPANSIONS = 64
+
+# Merged impact classes kept for recently searched prefixes, until the next write
+MAX_CACHED_PREFIXES = 256
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        # Cheap plural folding so "pearls" matches "pearl"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# Everything about a document that scoring and filtering look at:
+# (length, category, in stock)
+DocClass = Tuple[int, str, bool]
+
+# A term's postings grouped by (term frequency,) + DocClass
+Impacts = Dict[Tuple[int, int, str, bool], Set[str]]
+
+
+class CatalogSearchIndex:
+    """In-process inverted index over the pearl catalog with BM25 ranking.
+
+    Documents are added incrementally as pearls are written, so lookups never
+    touch MongoDB; callers fetch the winning documents by id afterwards.
+
+    A document's BM25 score for a term depends only on the term frequency and
+    the document length, so each term's postings are grouped into impact
+    classes by those two plus the filtered attributes. Queries score classes
+    (a few hundred even when every product matches) instead of documents,
+    filter by picking classes, and only sort ids inside the classes that
+    reach the requested window.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._impacts: Dict[str, Impacts] = defaultdict(dict)
+        self._terms: List[str] = []
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._doc_class: Dict[str, DocClass] = {}
+        self._total_length = 0
+        self._merged: Dict[Tuple[str, ...], Tuple[Impacts, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_class)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def rebuild(self, pearls: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for pearl in pearls:
+            self.add(pearl)
+
+    def add(self, pearl: Dict[str, Any]) -> None:
+        pearl_id = pearl["id"]
+        if pearl_id in self._doc_class:
+            self.remove(pearl_id)
+
+        frequencies: Dict[str, int] = defaultdict(int)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(pearl.get(field) or ""):
+                frequencies[token] += weight
+
+        doc_class = (sum(frequencies.values()), pearl["category"], bool(pearl.get("in_stock", True)))
+        for term, frequency in frequencies.items():
+            postings = self._postings[term]
+            if not postings:
+                bisect.insort(self._terms, term)
+            postings[pearl_id] = frequency
+            self._impacts[term].setdefault((frequency,) + doc_class, set()).add(pearl_id)
+
+        self._doc_terms[pearl_id] = list(frequencies)
+        self._doc_class[pearl_id] = doc_class
+        self._total_length += doc_class[0]
+        self._merged.clear()
+
+    def remove(self, pearl_id: str) -> None:
+        if pearl_id not in self._doc_class:
+            return
+
+        doc_class = self._doc_class.pop(pearl_id)
+        for term in self._doc_terms.pop(pearl_id):
+            postings = self._postings[term]
+            key = (postings.pop(pearl_id),) + doc_class
+            impacts = self._impacts[term]
+            impacts[key].discard(pearl_id)
+            if not impacts[key]:
+                del impacts[key]
+            if not postings:
+                del self._postings[term]
+                del self._impacts[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+        self._total_length -= doc_class[0]
+        self._merged.clear()
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._terms, prefix)
+        matches = []
+        for term in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        in_stock_only: bool = True,
+    ) -> Tuple[List[str], int]:
+        """Return (ranked pearl ids for the requested window, total match count).
+
+        Every query term must match; the last term also matches as a prefix so
+        partially typed words still find results.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+
+        # Each query term becomes a group of alternative index terms; the last
+        # term only expands as a prefix when it is not a whole word already
+        groups = [(token,) if token in self._postings else () for token in tokens]
+        if not groups[-1]:
+            groups[-1] = tuple(self._expand_prefix(tokens[-1]))
+        if any(not group for group in groups):
+            return [], 0
+
+        # A repeated word matches the same documents and just counts again
+        terms = [(self._group_impacts(group), repeats) for group, repeats in Counter(groups).items()]
+        terms.sort(key=lambda term: term[0][1])
+
+        # Filters pick classes of the most selective term; the other terms'
+        # classes are intersected in where their document class agrees
+        combined: Dict[Tuple[DocClass, Tuple[int, ...]], Set[str]] = {}
+        for (frequency, *doc_class), pearl_ids in terms[0][0][0].items():
+            if category and doc_class[1] != category:
+                continue
+            if in_stock_only and not doc_class[2]:
+                continue
+            combined[tuple(doc_class), (frequency,)] = pearl_ids
+        for (impacts, _), _ in terms[1:]:
+            by_class: Dict[DocClass, List[Tuple[int, Set[str]]]] = defaultdict(list)
+            for (frequency, *doc_class), pearl_ids in impacts.items():
+                by_class[tuple(doc_class)].append((frequency, pearl_ids))
+            narrowed = {}
+            for (doc_class, frequencies), pearl_ids in combined.items():
+                for frequency, other_ids in by_class.get(doc_class, ()):
+                    both = pearl_ids & other_ids
+                    if both:
+                        narrowed[doc_class, frequencies + (frequency,)] = both
+            combined = narrowed
+        if not combined:
+            return [], 0
+
+        doc_count = len(self._doc_class)
+        average_length = self._total_length / doc_count
+        weights = [
+            math.log(1 + (doc_count - matched + 0.5) / (matched + 0.5)) * (self.k1 + 1) * repeats
+            for (_, matched), repeats in terms
+        ]
+        scored: Dict[float, List[Set[str]]] = defaultdict(list)
+        for (doc_class, frequencies), pearl_ids in combined.items():
+            norm = self.k1 * (1 - self.b + self.b * doc_class[0] / average_length)
+            score = sum(weight * frequency / (frequency + norm) for weight, frequency in zip(weights, frequencies))
+            scored[score].append(pearl_ids)
+
+        # Walk the classes best first, stopping once the window is full; ties
+        # within a score break by id. Classes before the window are skipped
+        # by size alone.
+        ranked: List[str] = []
+        skip = offset
+        for score in sorted(scored, reverse=True):
+            tied = scored[score]
+            size = sum(len(pearl_ids) for pearl_ids in tied)
+            if size <= skip:
+                skip -= size
+                continue
+            pearl_ids = tied[0] if len(tied) == 1 else set().union(*tied)
+            ranked.extend(heapq.nlargest(skip + limit - len(ranked), pearl_ids)[skip:])
+            skip = 0
+            if len(ranked) >= limit:
+                break
+        return ranked, sum(len(pearl_ids) for pearl_ids in combined.values())
+
+    def _group_impacts(self, group: Tuple[str, ...]) -> Tuple[Impacts, int]:
+        """Impact classes for one query term and its number of matching documents.
+
+        For a prefix matching several index terms a document takes its highest
+        frequency among them.
+        """
+        if len(group) == 1:
+            return self._impacts[group[0]], len(self._postings[group[0]])
+
+        cached = self._merged.get(group)
+        if cached is not None:
+            return cached
+
+        merged: Impacts = defaultdict(set)
+        for term in group:
+            for key, pearl_ids in self._impacts[term].items():
+                merged[key] |= pearl_ids
+        impacts = {}
+        seen: Dict[DocClass, Set[str]] = defaultdict(set)
+        # Highest frequency first, so each document lands in its best class
+        for key in sorted(merged, key=lambda key: key[0], reverse=True):
+            pearl_ids = merged[key] - seen[key[1:]]
+            if pearl_ids:
+                impacts[key] = pearl_ids
+                seen[key[1:]] |= pearl_ids
+
+        if len(self._merged) >= MAX_CACHED_PREFIXES:
+            self._merged.clear()
+        result = self._merged[group] = (impacts, sum(len(pearl_ids) for pearl_ids in impacts.values()))
+        return result
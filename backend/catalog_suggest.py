@@ -0,0 +1,324 @@
+import heapq
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from catalog_search import MAX_PREFIX_EXPANSIONS, tokenize
+
+# Pearl attributes offered as suggestions, with how strongly each ranks
+SUGGEST_FIELDS = {"category": 3.0, "origin": 2.0, "name": 1.0}
+
+# Most suggestions a request may ask for; also the per-node cache size
+MAX_SUGGESTIONS = 20
+
+# Minimum trigram similarity (Jaccard) for a token to count as a typo of another
+MIN_SIMILARITY = 0.4
+
+MAX_CORRECTIONS = 3
+
+
+def trigrams(token: str) -> Set[str]:
+    # Padding on both sides lets short tokens and word edges carry weight
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Node:
+    __slots__ = ("children", "phrases", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Phrases containing the token that ends at this node
+        self.phrases: Set[int] = set()
+        # Best phrases anywhere below this node, built on first lookup
+        self.top: Optional[List[int]] = None
+
+
+class CatalogSuggestIndex:
+    """Autocomplete over distinct pearl names, categories and origins.
+
+    A character trie over phrase tokens answers prefix lookups; each node
+    caches its best phrases, so a single-word prefix is a walk plus a list
+    copy once warm. Tokens the trie cannot find are matched against a
+    trigram index of the vocabulary, so "tahition" still suggests Tahitian.
+    Only in-stock pearls count, matching what search returns.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+        self._phrase_ids: Dict[Tuple[str, str], int] = {}
+        self._phrase_text: Dict[int, str] = {}
+        self._phrase_field: Dict[int, str] = {}
+        self._phrase_tokens: Dict[int, List[str]] = {}
+        self._phrase_count: Dict[int, int] = {}
+        # Sort key per phrase, refreshed whenever its count changes
+        self._ranks: Dict[int, Tuple[float, int, str]] = {}
+        self._next_phrase_id = 0
+        self._pearl_phrases: Dict[str, List[int]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._phrase_text)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def rebuild(self, pearls: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for pearl in pearls:
+            self.add(pearl)
+
+    def add(self, pearl: Dict[str, Any]) -> None:
+        self.remove(pearl["id"])
+        if not pearl.get("in_stock", True):
+            return
+
+        phrase_ids = []
+        for field in SUGGEST_FIELDS:
+            text = (pearl.get(field) or "").strip()
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            key = (field, " ".join(tokens))
+            phrase_id = self._phrase_ids.get(key)
+            if phrase_id is None:
+                phrase_id = self._create_phrase(key, text, field, tokens)
+            self._phrase_count[phrase_id] += 1
+            self._update_rank(phrase_id, grew=True)
+            phrase_ids.append(phrase_id)
+        self._pearl_phrases[pearl["id"]] = phrase_ids
+
+    def remove(self, pearl_id: str) -> None:
+        for phrase_id in self._pearl_phrases.pop(pearl_id, ()):
+            self._phrase_count[phrase_id] -= 1
+            self._update_rank(phrase_id, grew=False)
+            if not self._phrase_count[phrase_id]:
+                self._delete_phrase(phrase_id)
+
+    def _create_phrase(self, key: Tuple[str, str], text: str, field: str, tokens: List[str]) -> int:
+        phrase_id = self._next_phrase_id
+        self._next_phrase_id += 1
+        self._phrase_ids[key] = phrase_id
+        self._phrase_text[phrase_id] = text
+        self._phrase_field[phrase_id] = field
+        self._phrase_tokens[phrase_id] = tokens
+        self._phrase_count[phrase_id] = 0
+
+        for token in set(tokens):
+            node = self._root
+            for char in token:
+                node = node.children.setdefault(char, _Node())
+            node.phrases.add(phrase_id)
+
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                # Numbers (sizes, SKUs) are not worth typo-correcting
+                if not token.isdigit():
+                    for gram in trigrams(token):
+                        self._trigrams[gram].add(token)
+            postings.add(phrase_id)
+        return phrase_id
+
+    def _delete_phrase(self, phrase_id: int) -> None:
+        tokens = self._phrase_tokens.pop(phrase_id)
+        field = self._phrase_field.pop(phrase_id)
+        del self._phrase_ids[(field, " ".join(tokens))]
+        del self._phrase_text[phrase_id]
+        del self._phrase_count[phrase_id]
+        del self._ranks[phrase_id]
+
+        for token in set(tokens):
+            path = [self._root]
+            for char in token:
+                path.append(path[-1].children[char])
+            path[-1].phrases.discard(phrase_id)
+            # Prune nodes left with nothing below them
+            for depth in range(len(token), 0, -1):
+                node = path[depth]
+                if node.phrases or node.children:
+                    break
+                del path[depth - 1].children[token[depth - 1]]
+
+            postings = self._postings[token]
+            postings.discard(phrase_id)
+            if not postings:
+                del self._postings[token]
+                for gram in trigrams(token):
+                    self._trigrams[gram].discard(token)
+                    if not self._trigrams[gram]:
+                        del self._trigrams[gram]
+
+    def _update_rank(self, phrase_id: int, grew: bool) -> None:
+        text = self._phrase_text[phrase_id]
+        # Popular first, then shorter, then alphabetical for a stable order
+        score = SUGGEST_FIELDS[self._phrase_field[phrase_id]] * self._phrase_count[phrase_id]
+        rank = self._ranks[phrase_id] = (score, -len(text), text)
+
+        # Patch the cached top lists on the phrase's trie paths rather than
+        # dropping them, so a write does not make the next lookup walk a
+        # whole subtree
+        for token in set(self._phrase_tokens[phrase_id]):
+            node = self._root
+            self._patch_top(node, phrase_id, rank, grew)
+            for char in token:
+                node = node.children[char]
+                self._patch_top(node, phrase_id, rank, grew)
+
+    def _patch_top(self, node: _Node, phrase_id: int, rank: Tuple[float, int, str], grew: bool) -> None:
+        top = node.top
+        if top is None:
+            return
+        # A list shorter than MAX_SUGGESTIONS holds every phrase below the node
+        if phrase_id in top:
+            if not grew and len(top) == MAX_SUGGESTIONS:
+                # Something outside the list may now outrank it
+                node.top = None
+                return
+            if not self._phrase_count[phrase_id]:
+                top.remove(phrase_id)
+                return
+        elif not grew:
+            return
+        elif len(top) < MAX_SUGGESTIONS:
+            top.append(phrase_id)
+        elif rank > self._ranks[top[-1]]:
+            top[-1] = phrase_id
+        else:
+            return
+        top.sort(key=self._ranks.__getitem__, reverse=True)
+
+    def _find(self, prefix: str) -> Optional[_Node]:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _top(self, node: _Node) -> List[int]:
+        if node.top is None:
+            found: Set[int] = set()
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                found.update(current.phrases)
+                stack.extend(current.children.values())
+            node.top = heapq.nlargest(MAX_SUGGESTIONS, found, key=self._ranks.__getitem__)
+        return node.top
+
+    def _expand(self, node: _Node, prefix: str) -> List[str]:
+        tokens = []
+        stack = [(node, prefix)]
+        while stack and len(tokens) < MAX_PREFIX_EXPANSIONS:
+            current, text = stack.pop()
+            if current.phrases:
+                tokens.append(text)
+            stack.extend((child, text + char) for char, child in current.children.items())
+        return tokens
+
+    def corrections(self, token: str) -> List[Tuple[str, float]]:
+        """Vocabulary tokens that look like typos of ``token``, best first."""
+        grams = trigrams(token)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+
+        scored = []
+        for candidate, overlap in shared.items():
+            similarity = overlap / (len(grams) + len(trigrams(candidate)) - overlap)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((similarity, candidate))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(candidate, similarity) for similarity, candidate in scored[:MAX_CORRECTIONS]]
+
+    def correct_query(self, query: str) -> Optional[str]:
+        """The query with unknown tokens replaced by their closest match, or
+        None when every token is known or some token has no close match."""
+        tokens = tokenize(query)
+        corrected = []
+        changed = False
+        for token in tokens:
+            if token in self._postings:
+                corrected.append(token)
+                continue
+            matches = self.corrections(token)
+            if not matches:
+                return None
+            corrected.append(matches[0][0])
+            changed = True
+        return " ".join(corrected) if changed else None
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Ranked suggestions for a partially typed, possibly misspelled query.
+
+        Every word but the last must match a vocabulary token (or its closest
+        typo correction); the last word matches as a prefix, falling back to
+        typo corrections when nothing starts with it.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        # (postings, similarity) for each complete word
+        required: List[Tuple[Set[int], float]] = []
+        for token in tokens[:-1]:
+            if token in self._postings:
+                required.append((self._postings[token], 1.0))
+                continue
+            matches = self.corrections(token)
+            if not matches:
+                return []
+            candidate, similarity = matches[0]
+            required.append((self._postings[candidate], similarity))
+
+        prefix = tokens[-1]
+        node = self._find(prefix)
+        similarity = 1.0
+        if node is not None:
+            last_words = [(node, prefix)]
+        else:
+            matches = self.corrections(prefix)
+            if not matches:
+                return []
+            last_words = [(self._find(candidate), candidate) for candidate, _ in matches]
+            similarity = matches[0][1]
+        ranked = self._match([postings for postings, _ in required], last_words, limit)
+
+        confidence = similarity
+        for _, word_similarity in required:
+            confidence = min(confidence, word_similarity)
+        return [
+            {
+                "text": self._phrase_text[phrase_id],
+                "field": self._phrase_field[phrase_id],
+                "count": self._phrase_count[phrase_id],
+                "corrected": confidence < 1.0,
+            }
+            for phrase_id in ranked
+        ]
+
+    def _match(self, required: List[Set[int]], last_words: List[Tuple[_Node, str]], limit: int) -> List[int]:
+        tops = [self._top(node) for node, _ in last_words]
+        pool = sorted(set().union(*tops), key=self._ranks.__getitem__, reverse=True)
+        if not required:
+            return pool[:limit]
+
+        # The cached best phrases under the prefix usually satisfy the other
+        # words already; they are exact when enough match or when they cover
+        # every phrase under the prefix
+        required = sorted(required, key=len)
+        ranked = [phrase_id for phrase_id in pool if all(phrase_id in postings for postings in required)]
+        if len(ranked) >= limit or all(len(top) < MAX_SUGGESTIONS for top in tops):
+            return ranked[:limit]
+
+        # Set operations iterate the smaller side, so stay in C throughout
+        candidates = required[0]
+        if len(required) > 1:
+            candidates = candidates.intersection(*required[1:])
+        matched: Set[int] = set()
+        for node, prefix in last_words:
+            for token in self._expand(node, prefix):
+                matched |= candidates & self._postings[token]
+        return heapq.nlargest(limit, matched, key=self._ranks.__getitem__)
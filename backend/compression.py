@@ -0,0 +1,191 @@
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+# Media types worth compressing; images other than SVG are already compressed
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def _gzip(body: bytes) -> bytes:
+    # Level 6 is the usual speed/ratio sweet spot; mtime=0 keeps output stable
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+CODECS = {"gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _zstd = zstandard.ZstdCompressor(level=3)
+    CODECS["zstd"] = _zstd.compress
+
+# Tie-break between equally acceptable encodings: best ratio per CPU first
+PREFERENCE = ("zstd", "br", "gzip")
+
+
+def parse_accept_encoding(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    accepted = parse_accept_encoding(accept_encoding)
+    return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best available coding the client accepts, or None for identity."""
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for name in PREFERENCE:
+        if name not in CODECS:
+            continue
+        quality = accepted.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Compresses complete response bodies the client can decode.
+
+    Streaming responses, bodies under ``minimum_size``, media that is already
+    compressed, and responses that set their own Content-Encoding go out
+    untouched. Shared-cacheable responses that carry a strong ETag have their
+    compressed bytes cached under (ETag, coding): the ETag is a hash of the
+    body, so an identical payload is only compressed once.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, cache: Optional[TTLCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = _header_map(message["headers"])
+                if b"content-encoding" in headers or not is_compressible(headers.get(b"content-type", b"").decode("latin-1")):
+                    passthrough = True
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streamed or small: not worth buffering or compressing
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = list(start_message["headers"])
+            compressed = self.compress(body, encoding, _header_map(headers))
+            await send({**start_message, "headers": _encoded_headers(headers, encoding, len(compressed))})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def compress(self, body: bytes, encoding: str, headers: Dict[bytes, bytes]) -> bytes:
+        etag = headers.get(b"etag", b"")
+        cacheable = (
+            self.cache is not None
+            and etag.startswith(b'"')
+            and b"private" not in headers.get(b"cache-control", b"")
+        )
+        if cacheable:
+            compressed = self.cache.get((etag, encoding))
+            if compressed is not None:
+                return compressed
+
+        compressed = CODECS[encoding](body)
+        if cacheable:
+            self.cache.set((etag, encoding), compressed)
+        return compressed
+
+
+def _header_map(headers: List[Tuple[bytes, bytes]]) -> Dict[bytes, bytes]:
+    return {name.lower(): value for name, value in headers}
+
+
+def _encoded_headers(headers: List[Tuple[bytes, bytes]], encoding: str, length: int) -> List[Tuple[bytes, bytes]]:
+    result = []
+    vary = []
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered == b"content-length":
+            continue
+        if lowered == b"vary":
+            vary.append(value)
+            continue
+        if lowered == b"etag" and value.startswith(b'"'):
+            # The encoded bytes differ from the identity ones, so the tag can
+            # only be weak; If-None-Match still matches it by weak comparison
+            value = b"W/" + value
+        result.append((name, value))
+
+    if not any(b"accept-encoding" in value.lower() for value in vary):
+        vary.append(b"Accept-Encoding")
+    result.append((b"vary", b", ".join(vary)))
+    result.append((b"content-encoding", encoding.encode()))
+    result.append((b"content-length", str(length).encode()))
+    return result
@@ -0,0 +1,74 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, UnidentifiedImageError
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # optional: needs the system cairo library
+    cairosvg = None
+
+# Longest edge, in pixels, of each generated variant
+VARIANT_SIZES = {"thumbnail": 160, "medium": 480}
+
+VARIANTS = ("original",) + tuple(VARIANT_SIZES)
+
+SVG_TYPE = "image/svg+xml"
+
+
+def render_variants(data: bytes, content_type: str) -> Dict[str, Tuple[bytes, str]]:
+    """Resize an image into every variant, returning {variant: (bytes, content type)}.
+
+    CPU-bound; runs in worker processes. SVGs are rasterized when cairosvg is
+    available; otherwise the vector source is reused, since it scales for free.
+    Formats Pillow (or cairosvg) cannot read produce no variants.
+    """
+    if content_type == SVG_TYPE:
+        if cairosvg is None:
+            return {name: (data, content_type) for name in VARIANT_SIZES}
+        largest = max(VARIANT_SIZES.values())
+        try:
+            data = cairosvg.svg2png(bytestring=data, output_width=largest)
+        except Exception:
+            # Malformed uploads fail all over cairosvg (XML ParseError,
+            # ValueError, KeyError, ...); treat them like unreadable rasters
+            return {}
+
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return {}
+
+    # WebP keeps transparency and is far smaller than PNG at thumbnail sizes
+    source = source.convert("RGBA" if "A" in source.getbands() or "transparency" in source.info else "RGB")
+    variants = {}
+    for name, size in VARIANT_SIZES.items():
+        image = source.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=80, method=4)
+        variants[name] = (buffer.getvalue(), "image/webp")
+    return variants
+
+
+class ImageProcessor:
+    """Runs render_variants in a process pool so resizing never blocks the event loop."""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def render(self, data: bytes, content_type: str) -> Dict[str, Tuple[bytes, str]]:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, render_variants, data, content_type)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
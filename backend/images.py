@@ -0,0 +1,102 @@
+import base64
+import binascii
+import hashlib
+from typing import AsyncIterator, Optional, Tuple
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+
+
+# Only these are accepted and served inline; anything else (text/html, ...)
+# would execute same-origin when opened from the image URL
+ALLOWED_IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/webp", "image/gif", "image/svg+xml"})
+
+# Largest decoded image accepted
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def is_data_uri(value: str) -> bool:
+    return value.startswith("data:")
+
+
+def decode_data_uri(uri: str) -> Tuple[bytes, str]:
+    """Split a ``data:<type>;base64,<payload>`` URI into raw bytes and content type."""
+    try:
+        header, payload = uri[len("data:"):].split(",", 1)
+    except ValueError:
+        raise InvalidImage("Malformed data URI")
+
+    params = header.split(";")
+    content_type = params[0].strip().lower()
+    if content_type not in ALLOWED_IMAGE_TYPES:
+        raise InvalidImage(f"Unsupported image type: {content_type or 'none'}")
+    if "base64" not in params[1:]:
+        raise InvalidImage("Only base64 data URIs are supported")
+    # Checked before decoding so an oversized payload is never materialized
+    if len(payload) > (MAX_IMAGE_BYTES + 2) // 3 * 4:
+        raise InvalidImage(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise InvalidImage("Image payload is not valid base64")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise InvalidImage(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+    return data, content_type
+
+
+def compute_etag(data: bytes) -> str:
+    return '"%s"' % hashlib.sha256(data).hexdigest()
+
+
+class StoredImage:
+    def __init__(self, grid_out):
+        self._grid_out = grid_out
+        metadata = grid_out.metadata or {}
+        self.content_type = metadata.get("content_type", "application/octet-stream")
+        self.etag = metadata["etag"]
+        self.length = grid_out.length
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await self._grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+
+class ImageStore:
+    """Raw pearl images kept in GridFS, one file per (pearl, variant)."""
+
+    def __init__(self, database: AsyncIOMotorDatabase, bucket_name: str = "pearl_images"):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+
+    @staticmethod
+    def file_id(pearl_id: str, variant: str) -> str:
+        return f"{pearl_id}/{variant}"
+
+    async def put(self, pearl_id: str, data: bytes, content_type: str, variant: str = "original") -> str:
+        file_id = self.file_id(pearl_id, variant)
+        etag = compute_etag(data)
+        try:
+            await self.bucket.delete(file_id)
+        except NoFile:
+            pass
+        await self.bucket.upload_from_stream_with_id(
+            file_id,
+            file_id,
+            data,
+            metadata={"content_type": content_type, "etag": etag, "pearl_id": pearl_id, "variant": variant},
+        )
+        return etag
+
+    async def open(self, pearl_id: str, variant: str = "original") -> Optional[StoredImage]:
+        try:
+            grid_out = await self.bucket.open_download_stream(self.file_id(pearl_id, variant))
+        except NoFile:
+            return None
+        return StoredImage(grid_out)
@@ -0,0 +1,120 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    name: str
+    unique: bool = False
+    expire_after_seconds: Optional[int] = None
+
+    def create_kwargs(self) -> Dict[str, Any]:
+        kwargs = {"name": self.name, "unique": self.unique}
+        if self.expire_after_seconds is not None:
+            kwargs["expireAfterSeconds"] = self.expire_after_seconds
+        return kwargs
+
+
+# Every index the hot request paths rely on
+REQUIRED_INDEXES: List[IndexSpec] = [
+    IndexSpec("pearls", (("id", ASCENDING),), "pearls_id", unique=True),
+    IndexSpec(
+        "pearls",
+        (("in_stock", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)),
+        "pearls_in_stock_created_at_id",
+    ),
+    IndexSpec(
+        "pearls",
+        (("category", ASCENDING), ("in_stock", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)),
+        "pearls_category_in_stock_created_at_id",
+    ),
+    # Incremental catalog export filters on either timestamp
+    IndexSpec("pearls", (("created_at", ASCENDING),), "pearls_created_at"),
+    IndexSpec("pearls", (("updated_at", ASCENDING),), "pearls_updated_at"),
+    IndexSpec("users", (("email", ASCENDING),), "users_email", unique=True),
+    IndexSpec("users", (("id", ASCENDING),), "users_id", unique=True),
+    IndexSpec("user_sessions", (("session_token", ASCENDING),), "user_sessions_session_token", unique=True),
+    # Logout deletes by user_id; the per-user session cap trims oldest first
+    IndexSpec(
+        "user_sessions",
+        (("user_id", ASCENDING), ("created_at", ASCENDING)),
+        "user_sessions_user_id_created_at",
+    ),
+    # Mongo deletes sessions itself once expires_at has passed
+    IndexSpec("user_sessions", (("expires_at", ASCENDING),), "user_sessions_expires_at_ttl", expire_after_seconds=0),
+    IndexSpec("carts", (("user_id", ASCENDING),), "carts_user_id", unique=True),
+]
+
+# Indexes superseded by a declared one, as (collection, name); dropped on startup
+RETIRED_INDEXES: List[Tuple[str, str]] = [
+    # Prefix of user_sessions_user_id_created_at
+    ("user_sessions", "user_sessions_user_id"),
+]
+
+# Mongo's NamespaceNotFound and IndexNotFound error codes: nothing to drop
+NOTHING_TO_DROP = {26, 27}
+
+
+async def ensure_indexes(
+    db: AsyncIOMotorDatabase,
+    specs: List[IndexSpec] = REQUIRED_INDEXES,
+    retired: List[Tuple[str, str]] = RETIRED_INDEXES,
+) -> List[str]:
+    """Create the declared indexes, returning the names that could not be built.
+
+    create_index is a no-op when an identical index already exists, so this is
+    safe to run on every startup. Failures (e.g. duplicate emails blocking a
+    unique index) are logged rather than aborting startup. Retired indexes are
+    dropped so writes stop paying to maintain them.
+    """
+    for collection, name in retired:
+        try:
+            await db[collection].drop_index(name)
+            logger.info(f"Dropped retired index {name} on {collection}")
+        except OperationFailure as e:
+            if e.code not in NOTHING_TO_DROP:
+                logger.error(f"Cannot drop index {name} on {collection}: {e}")
+
+    failed = []
+    for spec in specs:
+        try:
+            await db[spec.collection].create_index(list(spec.keys), **spec.create_kwargs())
+        except OperationFailure as e:
+            logger.error(f"Cannot create index {spec.name} on {spec.collection}: {e}")
+            failed.append(spec.name)
+    return failed
+
+
+async def index_report(db: AsyncIOMotorDatabase, specs: List[IndexSpec] = REQUIRED_INDEXES) -> Dict[str, Any]:
+    """Compare declared indexes with what exists and how often each is used."""
+    declared: Dict[str, List[IndexSpec]] = {}
+    for spec in specs:
+        declared.setdefault(spec.collection, []).append(spec)
+
+    report = {}
+    for collection, collection_specs in declared.items():
+        existing = await db[collection].index_information()
+        usage = {}
+        async for stats in db[collection].aggregate([{"$indexStats": {}}]):
+            usage[stats["name"]] = {
+                "ops": stats["accesses"]["ops"],
+                "since": stats["accesses"]["since"],
+            }
+
+        declared_names = {spec.name for spec in collection_specs}
+        report[collection] = {
+            "missing": sorted(declared_names - set(existing)),
+            "undeclared": sorted(set(existing) - declared_names - {"_id_"}),
+            "unused": sorted(name for name, stats in usage.items() if stats["ops"] == 0 and name != "_id_"),
+            "usage": usage,
+        }
+    return report
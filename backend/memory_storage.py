@@ -0,0 +1,297 @@
+import bisect
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from images import compute_etag
+from storage import (
+    BulkUpsertResult,
+    CartRepository,
+    DuplicateEntry,
+    PearlRepository,
+    SessionRepository,
+    Storage,
+    UserRepository,
+    as_utc,
+)
+
+# Methods below never await between reading and writing state, so each one
+# is atomic with respect to other coroutines, like a single Mongo update.
+
+
+def _project(doc: Dict[str, Any], fields=None, exclude=()) -> Dict[str, Any]:
+    if fields is not None:
+        return {name: doc[name] for name in fields if name in doc}
+    return {key: value for key, value in doc.items() if key not in exclude}
+
+
+def _copy_cart(cart: Dict[str, Any]) -> Dict[str, Any]:
+    return {**cart, "items": [dict(item) for item in cart["items"]]}
+
+
+class MemoryPearlRepository(PearlRepository):
+    def __init__(self):
+        self._pearls: Dict[str, Dict[str, Any]] = {}
+        # (created_at, id) kept sorted for keyset pagination
+        self._order: List[Tuple[datetime, str]] = []
+
+    def _sort_key(self, pearl: Dict[str, Any]) -> Tuple[datetime, str]:
+        return as_utc(pearl["created_at"]), pearl["id"]
+
+    def _store(self, pearl: Dict[str, Any]) -> None:
+        pearl = dict(pearl)
+        existing = self._pearls.get(pearl["id"])
+        if existing is not None:
+            del self._order[bisect.bisect_left(self._order, self._sort_key(existing))]
+        self._pearls[pearl["id"]] = pearl
+        bisect.insort(self._order, self._sort_key(pearl))
+
+    async def count(self):
+        return len(self._pearls)
+
+    async def get(self, pearl_id, fields=None):
+        pearl = self._pearls.get(pearl_id)
+        return None if pearl is None else _project(pearl, fields)
+
+    async def exists(self, pearl_id):
+        return pearl_id in self._pearls
+
+    async def get_many(self, pearl_ids, fields=None, category=None, in_stock_only=False):
+        found = []
+        for pearl_id in dict.fromkeys(pearl_ids):
+            pearl = self._pearls.get(pearl_id)
+            if pearl is None:
+                continue
+            if category and pearl["category"] != category:
+                continue
+            if in_stock_only and not pearl.get("in_stock", True):
+                continue
+            found.append(_project(pearl, fields))
+        return found
+
+    async def list_page(self, limit, after=None, category=None, in_stock_only=True, fields=None):
+        start = 0
+        if after:
+            start = bisect.bisect_right(self._order, (as_utc(after[0]), after[1]))
+        page = []
+        for _, pearl_id in self._order[start:]:
+            pearl = self._pearls[pearl_id]
+            if in_stock_only and not pearl.get("in_stock", True):
+                continue
+            if category and pearl["category"] != category:
+                continue
+            page.append(_project(pearl, fields))
+            if len(page) >= limit:
+                break
+        return page
+
+    async def iter_all(self, fields=None, exclude=(), since=None):
+        since = as_utc(since) if since else None
+        for pearl in list(self._pearls.values()):
+            if since:
+                updated_at = pearl.get("updated_at")
+                if as_utc(pearl["created_at"]) < since and (updated_at is None or as_utc(updated_at) < since):
+                    continue
+            yield _project(pearl, fields, exclude)
+
+    async def iter_inline_images(self):
+        for pearl in list(self._pearls.values()):
+            if pearl["image"].startswith("data:"):
+                yield {"id": pearl["id"], "image": pearl["image"]}
+
+    async def insert(self, pearl):
+        if pearl["id"] in self._pearls:
+            raise DuplicateEntry(f"Pearl {pearl['id']} already exists")
+        self._store(pearl)
+
+    async def insert_many(self, pearls):
+        for pearl in pearls:
+            await self.insert(pearl)
+
+    async def set_fields(self, pearl_id, values):
+        pearl = self._pearls.get(pearl_id)
+        if pearl is None:
+            return False
+        self._store({**pearl, **values})
+        return True
+
+    async def bulk_upsert(self, pearls):
+        result = BulkUpsertResult()
+        for pearl in pearls:
+            existing = self._pearls.get(pearl["id"])
+            if existing is None:
+                self._store(pearl)
+                result.inserted += 1
+            else:
+                self._store({**existing, **pearl, "created_at": existing["created_at"]})
+                result.updated += 1
+        return result
+
+
+class MemoryCartRepository(CartRepository):
+    def __init__(self):
+        self._carts: Dict[str, Dict[str, Any]] = {}
+
+    async def get(self, user_id):
+        cart = self._carts.get(user_id)
+        return None if cart is None else _copy_cart(cart)
+
+    async def create_if_missing(self, user_id, new_cart):
+        if user_id not in self._carts:
+            self._carts[user_id] = {
+                **new_cart,
+                "user_id": user_id,
+                "items": [],
+                "updated_at": datetime.now(timezone.utc),
+            }
+
+    async def add_item(self, user_id, item, new_cart):
+        cart = self._carts.get(user_id)
+        if cart is None:
+            cart = {**new_cart, "user_id": user_id, "items": [], "version": 0}
+            self._carts[user_id] = cart
+
+        for line in cart["items"]:
+            if line["pearl_id"] == item["pearl_id"]:
+                line["quantity"] += item["quantity"]
+                break
+        else:
+            cart["items"].append(dict(item))
+        cart["version"] = cart.get("version", 0) + 1
+        cart["updated_at"] = datetime.now(timezone.utc)
+
+    async def remove_item(self, user_id, item_id):
+        cart = self._carts.get(user_id)
+        if cart is None:
+            return
+        cart["items"] = [line for line in cart["items"] if line["id"] != item_id]
+        cart["version"] = cart.get("version", 0) + 1
+        cart["updated_at"] = datetime.now(timezone.utc)
+
+    async def set_quantity(self, user_id, item_id, quantity):
+        cart = self._carts.get(user_id)
+        if cart is None:
+            return False
+        for line in cart["items"]:
+            if line["id"] == item_id:
+                line["quantity"] = quantity
+                cart["version"] = cart.get("version", 0) + 1
+                cart["updated_at"] = datetime.now(timezone.utc)
+                return True
+        return False
+
+    async def update_items(self, user_id, transform, new_cart):
+        await self.create_if_missing(user_id, new_cart)
+        cart = self._carts[user_id]
+        cart["items"] = transform([dict(item) for item in cart["items"]])
+        cart["version"] = cart.get("version", 0) + 1
+        cart["updated_at"] = datetime.now(timezone.utc)
+        return _copy_cart(cart)
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self):
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._ids_by_email: Dict[str, str] = {}
+
+    async def get(self, user_id):
+        user = self._users.get(user_id)
+        return None if user is None else dict(user)
+
+    async def get_by_email(self, email):
+        user_id = self._ids_by_email.get(email)
+        return None if user_id is None else dict(self._users[user_id])
+
+    async def create(self, user):
+        if user["email"] in self._ids_by_email or user["id"] in self._users:
+            raise DuplicateEntry(f"User {user['email']} already exists")
+        self._users[user["id"]] = dict(user)
+        self._ids_by_email[user["email"]] = user["id"]
+
+
+class MemorySessionRepository(SessionRepository):
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+
+    async def get(self, session_token):
+        session = self._sessions.get(session_token)
+        return None if session is None else dict(session)
+
+    async def create(self, session):
+        self._sessions[session["session_token"]] = dict(session)
+
+    async def upsert(self, session):
+        existing = self._sessions.get(session["session_token"])
+        if existing is None:
+            await self.create(session)
+        else:
+            existing.update(user_id=session["user_id"], expires_at=session["expires_at"])
+
+    async def extend(self, session_token, expires_at):
+        session = self._sessions.get(session_token)
+        if session is not None:
+            session["expires_at"] = expires_at
+
+    async def delete_for_user(self, user_id):
+        for token in [token for token, session in self._sessions.items() if session["user_id"] == user_id]:
+            del self._sessions[token]
+
+    async def trim_for_user(self, user_id, keep):
+        sessions = [session for session in self._sessions.values() if session["user_id"] == user_id]
+        sessions.sort(key=lambda session: as_utc(session["created_at"]), reverse=True)
+        tokens = [session["session_token"] for session in sessions[keep:]]
+        for token in tokens:
+            del self._sessions[token]
+        return tokens
+
+    async def delete_expired(self, now, limit):
+        expired = [
+            token for token, session in self._sessions.items() if as_utc(session["expires_at"]) < now
+        ][:limit]
+        for token in expired:
+            del self._sessions[token]
+        return len(expired)
+
+    async def count(self):
+        return len(self._sessions)
+
+
+class MemoryStoredImage:
+    def __init__(self, data: bytes, content_type: str, etag: str):
+        self._data = data
+        self.content_type = content_type
+        self.etag = etag
+        self.length = len(data)
+
+    async def iter_chunks(self):
+        yield self._data
+
+
+class MemoryImageStore:
+    def __init__(self):
+        self._images: Dict[Tuple[str, str], MemoryStoredImage] = {}
+
+    async def put(self, pearl_id: str, data: bytes, content_type: str, variant: str = "original") -> str:
+        etag = compute_etag(data)
+        self._images[(pearl_id, variant)] = MemoryStoredImage(data, content_type, etag)
+        return etag
+
+    async def open(self, pearl_id: str, variant: str = "original") -> Optional[MemoryStoredImage]:
+        return self._images.get((pearl_id, variant))
+
+
+class MemoryStorage(Storage):
+    """Process-local storage with the same semantics as the Mongo backend.
+
+    Meant for profiling the HTTP and serialization layers without database
+    noise; nothing survives a restart and workers do not share data.
+    """
+
+    def __init__(self):
+        self.pearls = MemoryPearlRepository()
+        self.carts = MemoryCartRepository()
+        self.users = MemoryUserRepository()
+        self.sessions = MemorySessionRepository()
+        self.images = MemoryImageStore()
+
+    async def reset(self):
+        self.__init__()
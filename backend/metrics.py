@@ -0,0 +1,252 @@
+import bisect
+import contextvars
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Mongo calls made while handling the current request, when a trace is active
+_request_trace: contextvars.ContextVar[Optional[List[Tuple[str, str, float]]]] = contextvars.ContextVar(
+    "request_trace", default=None
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Updated from Motor's executor threads as well as the event loop
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Everything registered, in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to fully send an HTTP response", ("method", "route")
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled")
+mongo_commands = registry.counter(
+    "mongo_commands_total", "MongoDB commands by collection, command and outcome", ("collection", "command", "outcome")
+)
+mongo_command_duration = registry.histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time", ("collection", "command"), MONGO_BUCKETS
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command the driver sends and attributes it to the request
+    that issued it, if any.
+
+    Motor runs the driver on executor threads but copies the caller's context
+    along, so the request trace is visible from these callbacks.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event):
+        # getMore names the cursor id first and the collection separately
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome: str) -> None:
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        seconds = event.duration_micros / 1e6
+        mongo_commands.inc(collection, event.command_name, outcome)
+        mongo_command_duration.observe(seconds, collection, event.command_name)
+
+        trace = _request_trace.get()
+        if trace is not None:
+            trace.append((collection, event.command_name, seconds))
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class MetricsMiddleware:
+    """Records latency, status and concurrency per route template.
+
+    Requests that match no route share one label so that scanners probing
+    random paths cannot blow up the series count. When ``slow_request_seconds``
+    is set, slower requests are logged together with their Mongo calls.
+    """
+
+    def __init__(self, app, slow_request_seconds: float = 0):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        trace: List[Tuple[str, str, float]] = []
+        token = _request_trace.set(trace)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            _request_trace.reset(token)
+
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, route_path, str(status))
+            http_request_duration.observe(elapsed, method, route_path)
+
+            if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+                self.log_slow_request(method, scope["path"], status, elapsed, trace)
+
+    def log_slow_request(self, method, path, status, elapsed, trace) -> None:
+        mongo_seconds = sum(seconds for _, _, seconds in trace)
+        calls = ", ".join(
+            f"{collection}.{command} {seconds * 1000:.1f}ms" for collection, command, seconds in trace
+        )
+        logger.warning(
+            f"Slow request {method} {path} -> {status} in {elapsed * 1000:.1f}ms; "
+            f"{len(trace)} Mongo calls ({mongo_seconds * 1000:.1f}ms){': ' + calls if calls else ''}"
+        )
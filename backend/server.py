@@ -1,41 +1,149 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Cookie, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Cookie, Header, Query, Request, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, Optional, Dict, Any, Tuple
 import uuid
+import json
+import asyncio
+import time
+import orjson
 from datetime import datetime, timezone, timedelta
-import requests
 import base64
+import zlib
+
+from admission import AdmissionBudget, AdmissionMiddleware
+from auth_client import AuthServiceClient, AuthServiceUnavailable, CircuitBreaker, InvalidSession
+from cache import TTLCache
+from bulk_import import FORMATS, RecordError, iter_lines, iter_records
+from catalog_facets import CatalogFacetIndex
+from catalog_search import CatalogSearchIndex
+from catalog_suggest import MAX_SUGGESTIONS, CatalogSuggestIndex
+from compression import CompressionMiddleware, accepts_encoding
+from image_variants import SVG_TYPE, VARIANTS, ImageProcessor
+from images import ALLOWED_IMAGE_TYPES, InvalidImage, compute_etag, decode_data_uri, is_data_uri
+from metrics import MetricsMiddleware, MongoCommandListener, registry as metrics_registry
+from session_lifecycle import SessionSweeper
+from singleflight import SingleFlight
+from storage import ConcurrentModification, as_utc, create_storage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Storage backend: "mongo" (default) or "memory" for profiling without a DB
+storage = create_storage(
+    os.environ.get('STORAGE_BACKEND', 'mongo'),
+    mongo_url=os.environ.get('MONGO_URL'),
+    db_name=os.environ.get('DB_NAME'),
+    event_listeners=[MongoCommandListener()]
+)
+search_index = CatalogSearchIndex()
+facet_index = CatalogFacetIndex()
+suggest_index = CatalogSuggestIndex()
+
+# Thumbnail/medium rendering runs in worker processes; IMAGE_WORKERS=0 picks a default
+image_processor = ImageProcessor(int(os.environ.get('IMAGE_WORKERS', 0)) or None)
+
+# Auth provider client; the URL is overridable so a local stub can stand in
+auth_client = AuthServiceClient(
+    os.environ.get('AUTH_SERVICE_URL', "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"),
+    timeout=float(os.environ.get('AUTH_SERVICE_TIMEOUT', 5)),
+    retries=int(os.environ.get('AUTH_SERVICE_RETRIES', 2)),
+    breaker=CircuitBreaker(
+        threshold=int(os.environ.get('AUTH_SERVICE_BREAKER_THRESHOLD', 5)),
+        cooldown=float(os.environ.get('AUTH_SERVICE_BREAKER_COOLDOWN', 30)),
+    ),
+)
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 security = HTTPBearer(auto_error=False)
 
+# Resolved users keyed by session token, so authenticated calls skip the
+# user_sessions + users round-trips while the entry is fresh.
+session_cache = TTLCache(
+    maxsize=int(os.environ.get('SESSION_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', 300)),
+)
+
+# Pre-serialized catalog responses. Keys carry the catalog version, so a
+# write makes every older entry unreachable even for queries in flight.
+catalog_cache = TTLCache(
+    maxsize=int(os.environ.get('CATALOG_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('CATALOG_CACHE_TTL', 60)),
+)
+# Compressed catalog bodies keyed by (ETag, coding), so identical payloads
+# are compressed once rather than per request.
+compression_cache = TTLCache(
+    maxsize=int(os.environ.get('COMPRESSION_CACHE_SIZE', 512)),
+    ttl=float(os.environ.get('CATALOG_CACHE_TTL', 60)),
+)
+# Session lifecycle: expired rows are swept in the background, and each
+# user keeps at most MAX_SESSIONS_PER_USER live sessions.
+SESSION_LIFETIME = timedelta(days=7)
+MAX_SESSIONS_PER_USER = int(os.environ.get('MAX_SESSIONS_PER_USER', 10))
+session_sweeper = SessionSweeper(
+    storage,
+    interval=float(os.environ.get('SESSION_SWEEP_INTERVAL', 300)),
+    batch_size=int(os.environ.get('SESSION_SWEEP_BATCH', 500)),
+)
+
+# Admission control: each route class gets its own concurrency limit and
+# wait queue, so a flood of catalog reads cannot starve cart writes.
+def admission_budget(route_class: str, limit: int, queue_size: int) -> AdmissionBudget:
+    prefix = f"ADMISSION_{route_class.upper()}"
+    return AdmissionBudget(
+        route_class,
+        limit=int(os.environ.get(f"{prefix}_LIMIT", limit)),
+        queue_size=int(os.environ.get(f"{prefix}_QUEUE", queue_size)),
+        queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5)),
+        retry_after=int(os.environ.get('ADMISSION_RETRY_AFTER', 1)),
+    )
+
+admission_budgets = {
+    "catalog": admission_budget("catalog", 64, 256),
+    "cart": admission_budget("cart", 32, 128),
+    "auth": admission_budget("auth", 16, 64),
+    "default": admission_budget("default", 32, 128),
+}
+
+def classify_route(method: str, path: str) -> Optional[str]:
+    if path.startswith(("/api/metrics", "/api/cache/stats", "/api/admission/stats", "/api/diagnostics/")):
+        return None  # observability must keep working while we shed load
+    if path.startswith("/api/cart"):
+        return "cart"
+    if path.startswith("/api/auth/"):
+        return "auth"
+    if path.startswith("/api/pearls") and method in ("GET", "HEAD"):
+        return "catalog"
+    return "default"
+
+# Identical catalog reads that miss the cache at the same moment share one
+# query and one serialized body instead of each running their own find.
+pearl_list_flights = SingleFlight("pearl_list")
+pearl_detail_flights = SingleFlight("pearl_detail")
+
+catalog_version = 0
+# Distinguishes this process's version numbers from other workers'
+catalog_epoch = uuid.uuid4().hex[:8]
+
 # Pearl Models
 class Pearl(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     price: float
     category: str
-    image: str  # base64 encoded string
+    image: str  # URL, served from /api/pearls/{id}/image for uploaded images
+    thumbnail: Optional[str] = None  # smallest stored variant, for list views
     description: str
     size: str
     origin: str
@@ -46,11 +154,15 @@ class PearlCreate(BaseModel):
     name: str
     price: float
     category: str
-    image: str
+    image: str  # base64 data URI or image URL
     description: str
     size: str
     origin: str
 
+class PearlImportRow(PearlCreate):
+    id: Optional[str] = None  # rows with an id upsert the existing pearl
+    in_stock: bool = True
+
 class PearlUpdate(BaseModel):
     name: Optional[str] = None
     price: Optional[float] = None
@@ -87,6 +199,7 @@ class Cart(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     items: List[CartItem] = []
+    version: int = 0  # bumped by every mutation, feeds the cart ETag
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -94,6 +207,17 @@ class CartItemAdd(BaseModel):
     pearl_id: str
     quantity: int = 1
 
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    pearl_id: Optional[str] = None  # add
+    item_id: Optional[str] = None  # set, remove
+    quantity: int = 1  # add, set; setting 0 or less removes the line
+
+MAX_CART_OPERATIONS = 100
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=MAX_CART_OPERATIONS)
+
 # Authentication helper
 async def get_current_user(
     response: Response,
@@ -110,24 +234,191 @@ async def get_current_user(
     if not token:
         return None
     
-    # Find session in database
-    session = await db.user_sessions.find_one({"session_token": token})
-    if not session or session["expires_at"] < datetime.now(timezone.utc):
-        if session:
-            await db.user_sessions.delete_one({"_id": session["_id"]})
+    cached_user = session_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    
+    # Find session in database; expired rows are left to the sweeper
+    session = await storage.sessions.get(token)
+    if not session or as_utc(session["expires_at"]) < datetime.now(timezone.utc):
         return None
     
     # Find user
-    user_doc = await db.users.find_one({"id": session["user_id"]})
+    user_doc = await storage.users.get(session["user_id"])
     if not user_doc:
         return None
     
-    return User(**user_doc)
+    user = User(**user_doc)
+    # Never keep a user cached past the session's own expiry
+    remaining = (as_utc(session["expires_at"]) - datetime.now(timezone.utc)).total_seconds()
+    session_cache.set(token, user, ttl=remaining)
+    return user
+
+def invalidate_user_sessions(user_id: str) -> None:
+    session_cache.discard_if(lambda token, user: user.id == user_id)
+
+# Catalog cache helpers
+def bump_catalog_version() -> None:
+    """Call after any write to the pearls collection."""
+    global catalog_version
+    catalog_version += 1
+    catalog_cache.clear()
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def render_json(data: Any) -> bytes:
+    # Serialized once so the bytes can be cached and hashed
+    return orjson.dumps(data, default=_orjson_default)
+
+# Conditional request helpers
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def cart_etag(cart: Dict[str, Any], summary: bool = False, fields: Optional[set] = None) -> str:
+    """Version stamp for a priced cart: the cart's own version plus the catalog's.
+
+    Each response shape gets its own tag, since they are different representations.
+    """
+    updated_at = cart.get("updated_at")
+    stamp = ":".join([
+        cart["id"],
+        str(cart.get("version", 0)),
+        updated_at.isoformat() if updated_at else "",
+        catalog_epoch,
+        str(catalog_version),
+        "summary" if summary else ",".join(sorted(fields or ()))
+    ])
+    return compute_etag(stamp.encode())
+
+def pearl_from_db(pearl: Dict[str, Any]) -> Pearl:
+    """Build a Pearl from a stored document without re-validating it."""
+    return Pearl.model_construct(**pearl)
+
+# Pearl image helpers
+def pearl_image_url(pearl_id: str, variant: str = "original") -> str:
+    url = f"/api/pearls/{pearl_id}/image"
+    return url if variant == "original" else f"{url}?variant={variant}"
+
+async def store_image_variants(pearl: Dict[str, Any], data: bytes, content_type: str) -> None:
+    """Render and store the resized variants, pointing the pearl at its thumbnail."""
+    variants = await image_processor.render(data, content_type)
+    await asyncio.gather(*(
+        storage.images.put(pearl["id"], variant_data, variant_type, variant=variant)
+        for variant, (variant_data, variant_type) in variants.items()
+    ))
+    pearl["thumbnail"] = pearl_image_url(pearl["id"], "thumbnail") if "thumbnail" in variants else None
+
+async def store_pearl_image(pearl: Dict[str, Any]) -> None:
+    """Move an inline base64 image into the image store, leaving its URL on the pearl."""
+    if not is_data_uri(pearl["image"]):
+        return
+    data, content_type = decode_data_uri(pearl["image"])
+    await asyncio.gather(
+        storage.images.put(pearl["id"], data, content_type),
+        store_image_variants(pearl, data, content_type)
+    )
+    pearl["image"] = pearl_image_url(pearl["id"])
+
+async def migrate_inline_images():
+    async for pearl in storage.pearls.iter_inline_images():
+        try:
+            await store_pearl_image(pearl)
+        except InvalidImage as e:
+            logger.error(f"Cannot migrate image for pearl {pearl['id']}: {e}")
+            continue
+        await storage.pearls.set_fields(pearl["id"], {"image": pearl["image"], "thumbnail": pearl["thumbnail"]})
+
+async def backfill_image_variants():
+    """Render variants for stored images uploaded before variants existed."""
+    pending = [
+        pearl
+        async for pearl in storage.pearls.iter_all(fields=["id", "image", "thumbnail"])
+        if pearl["image"] == pearl_image_url(pearl["id"]) and not pearl.get("thumbnail")
+    ]
+    for pearl in pending:
+        image = await storage.images.open(pearl["id"])
+        if image is None:
+            continue
+        data = b"".join([chunk async for chunk in image.iter_chunks()])
+        await store_image_variants(pearl, data, image.content_type)
+        await storage.pearls.set_fields(pearl["id"], {"thumbnail": pearl["thumbnail"]})
+    if pending:
+        logger.info(f"Image variants generated for {len(pending)} pearls")
+
+# Catalog pagination helpers
+PEARL_FIELDS = set(Pearl.model_fields)
+
+def encode_cursor(pearl: Dict[str, Any]) -> str:
+    payload = json.dumps([as_utc(pearl["created_at"]).isoformat(), pearl["id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Turn an opaque cursor back into the (created_at, id) page key."""
+    try:
+        created_at, pearl_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), str(pearl_id)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Search results are ranked by relevance, so their cursor is a rank offset
+def encode_search_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+def decode_search_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+def parse_fields(fields: Optional[str]) -> Optional[set]:
+    if not fields:
+        return None
+    
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - PEARL_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested | {"id"}
+
+def project_pearl(pearl: Dict[str, Any], selected: set) -> Dict[str, Any]:
+    # Model field order, not set order: the body and its ETag must not
+    # depend on PYTHONHASHSEED
+    return {name: pearl[name] for name in Pearl.model_fields if name in selected and name in pearl}
+
+# In-process catalog indexes: search, facet counts and autocomplete
+CATALOG_INDEX_FIELDS = ["id", "name", "description", "category", "origin", "size", "price", "in_stock"]
+
+async def rebuild_catalog_indexes():
+    pearls = [pearl async for pearl in storage.pearls.iter_all(fields=CATALOG_INDEX_FIELDS)]
+    search_index.rebuild(pearls)
+    facet_index.rebuild(pearls)
+    suggest_index.rebuild(pearls)
+    logger.info(
+        f"Catalog indexes built: {len(search_index)} pearls searchable, {len(facet_index)} in stock, "
+        f"{len(suggest_index)} suggestions"
+    )
+
+def index_pearl(pearl: Dict[str, Any]) -> None:
+    search_index.add(pearl)
+    facet_index.add(pearl)
+    suggest_index.add(pearl)
 
 # Sample pearl data initialization
 async def init_sample_data():
     # Check if pearls already exist
-    existing_pearls = await db.pearls.count_documents({})
+    existing_pearls = await storage.pearls.count()
     if existing_pearls > 0:
         return
     
@@ -183,26 +474,30 @@ async def init_sample_data():
         }
     ]
     
-    await db.pearls.insert_many(sample_pearls)
+    await asyncio.gather(*(store_pearl_image(pearl) for pearl in sample_pearls))
+    
+    await storage.pearls.insert_many(sample_pearls)
     logger.info("Sample pearl data initialized")
 
 # Authentication endpoints
 @api_router.post("/auth/process-session")
-async def process_session(session_id: str, response: Response):
+async def process_session(session_id: str, response: Response, session_token: Optional[str] = Cookie(None)):
     try:
         # Call Emergent auth service to get session data
-        auth_response = requests.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id}
-        )
-        
-        if auth_response.status_code != 200:
+        try:
+            auth_data = await auth_client.fetch_session_data(session_id)
+        except InvalidSession:
             raise HTTPException(status_code=400, detail="Invalid session ID")
-        
-        auth_data = auth_response.json()
+        except AuthServiceUnavailable:
+            retry_after = max(1, round(auth_client.breaker.retry_after()))
+            raise HTTPException(
+                status_code=503,
+                detail="Sign-in is temporarily unavailable, please retry shortly",
+                headers={"Retry-After": str(retry_after)}
+            )
         
         # Check if user exists
-        existing_user = await db.users.find_one({"email": auth_data["email"]})
+        existing_user = await storage.users.get_by_email(auth_data["email"])
         
         if not existing_user:
             # Create new user
@@ -211,28 +506,39 @@ async def process_session(session_id: str, response: Response):
                 name=auth_data["name"],
                 picture=auth_data.get("picture")
             )
-            await db.users.insert_one(user.dict())
+            await storage.users.create(user.dict())
             user_id = user.id
         else:
             user_id = existing_user["id"]
         
-        # Create session
-        session_token = auth_data["session_token"]
-        expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+        now = datetime.now(timezone.utc)
+        expires_at = now + SESSION_LIFETIME
         
-        session = UserSession(
-            user_id=user_id,
-            session_token=session_token,
-            expires_at=expires_at
-        )
-        
-        await db.user_sessions.insert_one(session.dict())
+        # Re-login from a browser that still holds a live session for this
+        # user: extend that session rather than adding a row per login
+        current = await storage.sessions.get(session_token) if session_token else None
+        if current and current["user_id"] == user_id and as_utc(current["expires_at"]) > now:
+            token = session_token
+            await storage.sessions.extend(token, expires_at)
+        else:
+            token = auth_data["session_token"]
+            session = UserSession(
+                user_id=user_id,
+                session_token=token,
+                expires_at=expires_at
+            )
+            await storage.sessions.upsert(session.dict())
+            
+            # Enforce the per-user cap by dropping the oldest sessions
+            for stale_token in await storage.sessions.trim_for_user(user_id, MAX_SESSIONS_PER_USER):
+                session_cache.pop(stale_token)
+        session_cache.pop(token)
         
         # Set cookie
         response.set_cookie(
             "session_token",
-            session_token,
-            max_age=7*24*60*60,  # 7 days
+            token,
+            max_age=int(SESSION_LIFETIME.total_seconds()),
             httponly=True,
             secure=True,
             samesite="none",
@@ -249,6 +555,8 @@ async def process_session(session_id: str, response: Response):
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Session processing error: {e}")
         raise HTTPException(status_code=500, detail="Session processing failed")
@@ -256,7 +564,8 @@ async def process_session(session_id: str, response: Response):
 @api_router.post("/auth/logout")
 async def logout(response: Response, user: User = Depends(get_current_user)):
     if user:
-        await db.user_sessions.delete_many({"user_id": user.id})
+        await storage.sessions.delete_for_user(user.id)
+        invalidate_user_sessions(user.id)
     
     response.delete_cookie("session_token", path="/")
     return {"success": True}
@@ -267,125 +576,553 @@ async def get_me(user: User = Depends(get_current_user)):
         raise HTTPException(status_code=401, detail="Not authenticated")
     return user
 
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        "sessions": session_cache.stats(),
+        "catalog": {**catalog_cache.stats(), "version": catalog_version},
+        "compression": compression_cache.stats(),
+        "coalescing": {
+            "pearl_list": pearl_list_flights.stats(),
+            "pearl_detail": pearl_detail_flights.stats()
+        }
+    }
+
+@api_router.get("/admission/stats")
+async def get_admission_stats():
+    return {name: budget.stats() for name, budget in admission_budgets.items()}
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@api_router.get("/diagnostics/indexes")
+async def get_index_diagnostics():
+    return await storage.index_report()
+
 # Pearl endpoints
-@api_router.get("/pearls", response_model=List[Pearl])
-async def get_pearls(category: Optional[str] = None, search: Optional[str] = None):
-    query = {"in_stock": True}
+async def query_pearls(
+    category: Optional[str],
+    search: Optional[str],
+    limit: int,
+    after: Optional[str],
+    fields: Optional[str]
+):
+    """Run a catalog listing query, returning (pearls, next page cursor)."""
+    if category == "all":
+        category = None
     
-    if category and category != "all":
-        query["category"] = category
+    next_cursor = None
+    selected = parse_fields(fields)
+    projection = None
+    if selected:
+        # created_at is always needed to build the next cursor
+        projection = selected | {"created_at"}
     
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}}
-        ]
+        offset = decode_search_cursor(after) if after else 0
+        ranked_ids, matched = search_index.search(
+            search,
+            category=category,
+            limit=limit,
+            offset=offset
+        )
+        if not matched:
+            # Retry misspelled queries ("tahition") with their closest spelling
+            corrected = suggest_index.correct_query(search)
+            if corrected:
+                ranked_ids, matched = search_index.search(
+                    corrected,
+                    category=category,
+                    limit=limit,
+                    offset=offset
+                )
+        found = {
+            pearl["id"]: pearl
+            for pearl in await storage.pearls.get_many(
+                ranked_ids, fields=projection, category=category, in_stock_only=True
+            )
+        }
+        pearls = [found[pearl_id] for pearl_id in ranked_ids if pearl_id in found]
+        if offset + limit < matched:
+            next_cursor = encode_search_cursor(offset + limit)
+    else:
+        # Fetch one extra row to learn whether another page exists
+        pearls = await storage.pearls.list_page(
+            limit + 1,
+            after=decode_cursor(after) if after else None,
+            category=category,
+            fields=projection
+        )
+        
+        if len(pearls) > limit:
+            pearls = pearls[:limit]
+            next_cursor = encode_cursor(pearls[-1])
+    
+    if selected:
+        return [project_pearl(pearl, selected) for pearl in pearls], next_cursor
+    return [pearl_from_db(pearl) for pearl in pearls], next_cursor
+
+@api_router.get("/pearls")
+async def get_pearls(
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    key = ("pearls", catalog_version, category or "all", search, limit, after, fields)
+    
+    async def load():
+        pearls, next_cursor = await query_pearls(category, search, limit, after, fields)
+        body = render_json(pearls)
+        entry = (body, next_cursor, compute_etag(body))
+        catalog_cache.set(key, entry)
+        return entry
     
-    pearls = await db.pearls.find(query).to_list(100)
-    return [Pearl(**pearl) for pearl in pearls]
+    cached = catalog_cache.get(key)
+    if cached is None:
+        cached = await pearl_list_flights.do(key, load)
+    
+    body, next_cursor, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/pearls/facets")
+async def get_pearl_facets(
+    category: Optional[str] = None,
+    origin: Optional[str] = None,
+    size: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Counts per category, origin and size plus a price histogram for in-stock pearls."""
+    if category == "all":
+        category = None
+    
+    key = ("facets", catalog_version, category, origin, size)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        body = render_json(facet_index.facets(category=category, origin=origin, size=size))
+        cached = (body, compute_etag(body))
+        catalog_cache.set(key, cached)
+    
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/pearls/suggest")
+async def suggest_pearls(
+    q: str = Query(..., max_length=100),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS)
+):
+    """Autocomplete for the search box, tolerant of partial and misspelled words."""
+    # Answered from memory in well under a millisecond, so not worth caching
+    return Response(content=render_json(suggest_index.suggest(q, limit)), media_type="application/json")
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+@api_router.get("/pearls/export")
+async def export_pearls(
+    since: Optional[datetime] = None,
+    include_images: bool = True,
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Stream the whole catalog as NDJSON straight off a Mongo cursor."""
+    # Pick up pearls created or changed since the last sync
+    pearls = storage.pearls.iter_all(
+        exclude=() if include_images else ("image",),
+        since=as_utc(since) if since else None
+    )
+    
+    use_gzip = accepts_encoding(accept_encoding, "gzip")
+    
+    async def stream():
+        compressor = zlib.compressobj(wbits=31) if use_gzip else None
+        buffer = bytearray()
+        
+        def drain() -> bytes:
+            chunk = bytes(buffer)
+            buffer.clear()
+            if compressor:
+                return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            return chunk
+        
+        async for pearl in pearls:
+            buffer += orjson.dumps(pearl)
+            buffer += b"\n"
+            if len(buffer) >= EXPORT_CHUNK_SIZE:
+                yield drain()
+        
+        tail = drain()
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            yield tail
+    
+    headers = {"Vary": "Accept-Encoding"}
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
 
 @api_router.get("/pearls/{pearl_id}", response_model=Pearl)
-async def get_pearl(pearl_id: str):
-    pearl = await db.pearls.find_one({"id": pearl_id})
-    if not pearl:
-        raise HTTPException(status_code=404, detail="Pearl not found")
-    return Pearl(**pearl)
+async def get_pearl(pearl_id: str, if_none_match: Optional[str] = Header(None)):
+    key = ("pearl", catalog_version, pearl_id)
+    
+    async def load():
+        pearl = await storage.pearls.get(pearl_id)
+        if not pearl:
+            raise HTTPException(status_code=404, detail="Pearl not found")
+        body = render_json(pearl_from_db(pearl))
+        entry = (body, compute_etag(body))
+        catalog_cache.set(key, entry)
+        return entry
+    
+    cached = catalog_cache.get(key)
+    if cached is None:
+        cached = await pearl_detail_flights.do(key, load)
+    
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/pearls/{pearl_id}/image")
+async def get_pearl_image(
+    pearl_id: str,
+    variant: str = Query("original", pattern=f"^({'|'.join(VARIANTS)})$"),
+    if_none_match: Optional[str] = Header(None)
+):
+    image = await storage.images.open(pearl_id, variant)
+    if image is None and variant != "original":
+        # Not rendered (unsupported format); the original still displays
+        image = await storage.images.open(pearl_id)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": "public, max-age=86400",
+        "X-Content-Type-Options": "nosniff"
+    }
+    media_type = image.content_type
+    if media_type == SVG_TYPE:
+        # SVG can carry script; never let it run when opened directly
+        headers["Content-Security-Policy"] = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+    elif media_type not in ALLOWED_IMAGE_TYPES:
+        # Stored before uploads were restricted to images
+        media_type = "application/octet-stream"
+        headers["Content-Disposition"] = "attachment"
+    if etag_matches(if_none_match, image.etag):
+        return Response(status_code=304, headers=headers)
+    
+    headers["Content-Length"] = str(image.length)
+    return StreamingResponse(image.iter_chunks(), media_type=media_type, headers=headers)
 
 @api_router.post("/pearls", response_model=Pearl)
 async def create_pearl(pearl_data: PearlCreate, user: User = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    pearl = Pearl(**pearl_data.dict())
-    await db.pearls.insert_one(pearl.dict())
-    return pearl
+    pearl = Pearl(**pearl_data.dict()).dict()
+    try:
+        await store_pearl_image(pearl)
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    await storage.pearls.insert(pearl)
+    index_pearl(pearl)
+    bump_catalog_version()
+    return Pearl(**pearl)
 
-# Cart endpoints
-@api_router.get("/cart")
-async def get_cart(user: User = Depends(get_current_user)):
+# Bulk catalog import
+MAX_IMPORT_ERRORS = 1000
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+@api_router.post("/pearls/import")
+async def import_pearls(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern=f"^({'|'.join(FORMATS)})$"),
+    batch_size: int = Query(500, ge=1, le=5000),
+    user: User = Depends(get_current_user)
+):
+    """Stream NDJSON or CSV rows into the catalog, upserting by pearl id."""
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    cart = await db.carts.find_one({"user_id": user.id})
-    if not cart:
-        cart = Cart(user_id=user.id)
-        await db.carts.insert_one(cart.dict())
-        return {"items": [], "total": 0, "count": 0}
+    if not fmt:
+        fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    
+    started = time.perf_counter()
+    stats = {"received": 0, "inserted": 0, "updated": 0, "failed": 0}
+    errors = []
+    batch = []
+    
+    def record_error(row: int, message: str):
+        stats["failed"] += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"row": row, "error": message})
+    
+    async def flush():
+        # Images of the whole batch are stored and resized concurrently
+        outcomes = await asyncio.gather(
+            *(store_pearl_image(pearl) for _, pearl in batch),
+            return_exceptions=True
+        )
+        for (row, _), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            if not isinstance(outcome, InvalidImage):
+                raise outcome
+            record_error(row, str(outcome))
+        batch[:] = [entry for entry, outcome in zip(batch, outcomes) if outcome is None]
+        if not batch:
+            return
+        
+        result = await storage.pearls.bulk_upsert([pearl for _, pearl in batch])
+        for index, message in result.errors.items():
+            record_error(batch[index][0], message)
+        
+        stats["inserted"] += result.inserted
+        stats["updated"] += result.updated
+        for index, (_, pearl) in enumerate(batch):
+            if index not in result.errors:
+                index_pearl(pearl)
+        batch.clear()
+    
+    try:
+        async for row, record in iter_records(iter_lines(request.stream()), fmt):
+            stats["received"] += 1
+            if isinstance(record, RecordError):
+                record_error(row, str(record))
+                continue
+            
+            try:
+                item = PearlImportRow(**record).dict()
+            except ValidationError as e:
+                record_error(row, describe_validation_error(e))
+                continue
+            
+            if item["id"] is None:
+                del item["id"]
+            pearl = Pearl(**item).dict()
+            # Stamped so incremental exports pick up re-imported pearls
+            pearl["updated_at"] = datetime.now(timezone.utc)
+            if pearl["image"] == pearl_image_url(pearl["id"]):
+                # Same stored image (e.g. an export round-trip); keep its variants
+                del pearl["thumbnail"]
+            
+            batch.append((row, pearl))
+            if len(batch) >= batch_size:
+                await flush()
+        
+        if batch:
+            await flush()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be UTF-8")
+    finally:
+        # Earlier batches are already committed even if the stream broke off
+        if stats["inserted"] or stats["updated"]:
+            bump_catalog_version()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        **stats,
+        "errors": errors,
+        "errors_truncated": stats["failed"] > len(errors),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(stats["received"] / elapsed, 1) if elapsed else None
+    }
+
+# Cart endpoints
+async def materialize_cart(
+    items: List[Dict[str, Any]],
+    summary: bool = False,
+    fields: Optional[set] = None
+) -> Dict[str, Any]:
+    """Price cart items with a single batched pearl lookup.
+
+    A summary is just count and total, so only prices are loaded; otherwise
+    ``fields`` limits each embedded pearl. Both are applied as projections
+    in the lookup itself.
+    """
+    projection = None
+    if summary:
+        projection = {"id", "price"}
+    elif fields:
+        projection = fields | {"price"}
+    
+    pearl_ids = list({item["pearl_id"] for item in items})
+    pearls = {}
+    if pearl_ids:
+        for pearl in await storage.pearls.get_many(pearl_ids, fields=projection):
+            pearls[pearl["id"]] = pearl
     
-    # Get pearl details for each cart item
     cart_items = []
     total = 0
+    count = 0
     
-    for item in cart.get("items", []):
-        pearl = await db.pearls.find_one({"id": item["pearl_id"]})
+    for item in items:
+        count += item["quantity"]
+        pearl = pearls.get(item["pearl_id"])
         if pearl:
             item_total = pearl["price"] * item["quantity"]
+            total += item_total
+            if summary:
+                continue
             cart_items.append({
                 "id": item["id"],
-                "pearl": Pearl(**pearl),
+                "pearl": project_pearl(pearl, fields) if fields else pearl_from_db(pearl),
                 "quantity": item["quantity"],
                 "total": item_total
             })
-            total += item_total
     
+    if summary:
+        return {"total": total, "count": count}
     return {
         "items": cart_items,
         "total": total,
-        "count": sum(item["quantity"] for item in cart.get("items", []))
+        "count": count
     }
 
+def cart_insert_fields(user_id: str) -> Dict[str, Any]:
+    """Fields a cart gets only when an upsert creates it."""
+    cart = Cart(user_id=user_id)
+    return {"id": cart.id, "created_at": cart.created_at}
+
+async def add_cart_item(user_id: str, pearl_id: str, quantity: int) -> None:
+    """Atomically add quantity of a pearl, creating the cart or line as needed."""
+    new_item = CartItem(pearl_id=pearl_id, quantity=quantity)
+    try:
+        await storage.carts.add_item(user_id, new_item.dict(), cart_insert_fields(user_id))
+    except ConcurrentModification:
+        raise HTTPException(status_code=409, detail="Cart is being modified, please retry")
+
+def apply_cart_operations(items: List[Dict[str, Any]], operations: List[CartOperation]) -> List[Dict[str, Any]]:
+    """Apply operations in order, with the same semantics as the single-item endpoints."""
+    for operation in operations:
+        if operation.op == "add":
+            line = next((item for item in items if item["pearl_id"] == operation.pearl_id), None)
+            if line:
+                line["quantity"] += operation.quantity
+            else:
+                items.append(CartItem(pearl_id=operation.pearl_id, quantity=operation.quantity).dict())
+        elif operation.op == "remove":
+            items = [item for item in items if item["id"] != operation.item_id]
+        else:
+            line = next((item for item in items if item["id"] == operation.item_id), None)
+            if line is None:
+                raise HTTPException(status_code=404, detail=f"Cart item not found: {operation.item_id}")
+            if operation.quantity <= 0:
+                items.remove(line)
+            else:
+                line["quantity"] = operation.quantity
+    return items
+
+@api_router.get("/cart")
+async def get_cart(
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None)
+):
+    """The priced cart. view=summary returns only count and total (e.g. for
+    the cart badge); fields= picks the attributes of each embedded pearl."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    summary = view == "summary"
+    selected = None if summary else parse_fields(fields)
+    
+    cart = await storage.carts.get(user.id)
+    if not cart:
+        await storage.carts.create_if_missing(user.id, cart_insert_fields(user.id))
+        return await materialize_cart([], summary)
+    
+    etag = cart_etag(cart, summary, selected)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    body = render_json(await materialize_cart(cart.get("items", []), summary, selected))
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @api_router.post("/cart/add")
 async def add_to_cart(item: CartItemAdd, user: User = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
     # Verify pearl exists
-    pearl = await db.pearls.find_one({"id": item.pearl_id})
-    if not pearl:
+    if not await storage.pearls.exists(item.pearl_id):
         raise HTTPException(status_code=404, detail="Pearl not found")
     
-    # Get or create cart
-    cart = await db.carts.find_one({"user_id": user.id})
-    if not cart:
-        cart = Cart(user_id=user.id)
-        cart_dict = cart.dict()
-        await db.carts.insert_one(cart_dict)
-    
-    # Check if item already in cart
-    cart_items = cart.get("items", []) if cart else []
-    existing_item = None
-    
-    for cart_item in cart_items:
-        if cart_item["pearl_id"] == item.pearl_id:
-            existing_item = cart_item
-            break
-    
-    if existing_item:
-        # Update quantity
-        existing_item["quantity"] += item.quantity
-        await db.carts.update_one(
-            {"user_id": user.id},
-            {"$set": {"items": cart_items, "updated_at": datetime.now(timezone.utc)}}
-        )
-    else:
-        # Add new item
-        new_item = CartItem(pearl_id=item.pearl_id, quantity=item.quantity)
-        await db.carts.update_one(
-            {"user_id": user.id},
-            {"$push": {"items": new_item.dict()}, "$set": {"updated_at": datetime.now(timezone.utc)}}
-        )
+    await add_cart_item(user.id, item.pearl_id, item.quantity)
     
     return {"success": True, "message": "Item added to cart"}
 
+@api_router.post("/cart/batch")
+async def batch_update_cart(
+    batch: CartBatch,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    user: User = Depends(get_current_user)
+):
+    """Apply several cart edits in one atomic write and return the priced cart,
+    shaped by view= and fields= as in GET /api/cart."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    
+    summary = view == "summary"
+    selected = None if summary else parse_fields(fields)
+    
+    for operation in batch.operations:
+        if operation.op == "add" and (not operation.pearl_id or operation.quantity < 1):
+            raise HTTPException(status_code=400, detail="add needs a pearl_id and a positive quantity")
+        if operation.op != "add" and not operation.item_id:
+            raise HTTPException(status_code=400, detail=f"{operation.op} needs an item_id")
+    
+    # Verify every pearl being added exists, in one lookup
+    pearl_ids = {operation.pearl_id for operation in batch.operations if operation.op == "add"}
+    if pearl_ids:
+        found = await storage.pearls.get_many(list(pearl_ids), fields=["id"])
+        missing = pearl_ids - {pearl["id"] for pearl in found}
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Pearl not found: {sorted(missing)[0]}")
+    
+    try:
+        cart = await storage.carts.update_items(
+            user.id,
+            lambda items: apply_cart_operations(items, batch.operations),
+            cart_insert_fields(user.id)
+        )
+    except ConcurrentModification:
+        raise HTTPException(status_code=409, detail="Cart is being modified, please retry")
+    
+    body = render_json(await materialize_cart(cart["items"], summary, selected))
+    headers = {"ETag": cart_etag(cart, summary, selected), "Cache-Control": "private, no-cache"}
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @api_router.delete("/cart/{item_id}")
 async def remove_from_cart(item_id: str, user: User = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
     
-    await db.carts.update_one(
-        {"user_id": user.id},
-        {"$pull": {"items": {"id": item_id}}, "$set": {"updated_at": datetime.now(timezone.utc)}}
-    )
+    await storage.carts.remove_item(user.id, item_id)
     
     return {"success": True, "message": "Item removed from cart"}
 
@@ -397,33 +1134,41 @@ async def update_cart_item(item_id: str, quantity: int, user: User = Depends(get
     if quantity <= 0:
         return await remove_from_cart(item_id, user)
     
-    cart = await db.carts.find_one({"user_id": user.id})
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-    
-    # Update item quantity
-    cart_items = cart.get("items", [])
-    for item in cart_items:
-        if item["id"] == item_id:
-            item["quantity"] = quantity
-            break
-    
-    await db.carts.update_one(
-        {"user_id": user.id},
-        {"$set": {"items": cart_items, "updated_at": datetime.now(timezone.utc)}}
-    )
+    if not await storage.carts.set_quantity(user.id, item_id, quantity):
+        raise HTTPException(status_code=404, detail="Cart item not found")
     
     return {"success": True, "message": "Cart updated"}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Innermost, so 503s from load shedding still carry CORS headers
+app.add_middleware(
+    AdmissionMiddleware,
+    budgets=admission_budgets,
+    classify=classify_route,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+    cache=compression_cache,
+)
+
+# Outermost, so timings include every other middleware. Requests slower than
+# SLOW_REQUEST_MS are logged with their Mongo calls; 0 disables the log.
+app.add_middleware(
+    MetricsMiddleware,
+    slow_request_seconds=float(os.environ.get('SLOW_REQUEST_MS', 0)) / 1000,
 )
 
 # Configure logging
@@ -435,8 +1180,17 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_db():
+    await auth_client.start()
+    await storage.prepare()
     await init_sample_data()
+    await migrate_inline_images()
+    await backfill_image_variants()
+    await rebuild_catalog_indexes()
+    session_sweeper.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await session_sweeper.stop()
+    await auth_client.close()
+    image_processor.close()
+    await storage.close()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from metrics import registry
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+sessions_stored = registry.gauge(
+    "user_sessions_stored", "Rows in the sessions store, as of the last sweep"
+)
+sessions_swept = registry.counter(
+    "user_sessions_swept_total", "Expired sessions deleted by the background sweeper"
+)
+
+
+class SessionSweeper:
+    """Periodically deletes expired sessions in bounded batches.
+
+    On Mongo the TTL index already removes expired rows, but its monitor only
+    runs once a minute and the memory backend has nothing similar. Request
+    handlers just treat expired sessions as missing and leave cleanup to this.
+
+    The repository is looked up on each sweep, since ``Storage.reset`` may
+    replace it (the memory backend does).
+    """
+
+    def __init__(self, storage: Storage, interval: float = 300, batch_size: int = 500):
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self) -> int:
+        sessions = self.storage.sessions
+        now = datetime.now(timezone.utc)
+        deleted = 0
+        while True:
+            batch = await sessions.delete_expired(now, self.batch_size)
+            deleted += batch
+            if batch < self.batch_size:
+                break
+            # Let request handlers run between batches
+            await asyncio.sleep(0)
+
+        sessions_swept.inc(amount=deleted)
+        sessions_stored.set(value=await sessions.count())
+        return deleted
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                deleted = await self.sweep()
+                if deleted:
+                    logger.info(f"Session sweep deleted {deleted} expired sessions")
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from metrics import registry
+
+T = TypeVar("T")
+
+coalesced_calls = registry.counter(
+    "singleflight_calls_total", "Reads that asked for a coalesced result", ("group",)
+)
+coalesced_executions = registry.counter(
+    "singleflight_executions_total", "Reads that actually ran; calls / executions is the fan-in", ("group",)
+)
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller starts the work as its own task and every caller,
+    including the first, awaits it through ``asyncio.shield``. A caller that
+    is cancelled (e.g. its client disconnected) therefore only stops waiting;
+    the shared work runs on for everyone else.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        coalesced_calls.inc(self.name)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            coalesced_executions.inc(self.name)
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "in_flight": len(self._inflight),
+            "fan_in": self.calls / self.executions if self.executions else 0.0,
+        }
@@ -0,0 +1,474 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from images import ImageStore
+from indexes import ensure_indexes, index_report
+
+# (created_at, id) of the last pearl on the previous page
+PageKey = Tuple[datetime, str]
+
+# Takes a copy of a cart's items and returns the new items
+ItemsTransform = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+
+class StorageError(Exception):
+    pass
+
+
+class DuplicateEntry(StorageError):
+    pass
+
+
+class ConcurrentModification(StorageError):
+    pass
+
+
+@dataclass
+class BulkUpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    # Position in the submitted batch -> error message
+    errors: Dict[int, str] = field(default_factory=dict)
+
+
+def as_utc(value: datetime) -> datetime:
+    # Mongo hands back naive datetimes unless the client is tz-aware
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class PearlRepository(ABC):
+    """Catalog documents. Reads never include Mongo's ``_id``.
+
+    ``fields`` limits a read to the named keys; ``exclude`` drops keys instead.
+    """
+
+    @abstractmethod
+    async def count(self) -> int: ...
+
+    @abstractmethod
+    async def get(self, pearl_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def exists(self, pearl_id: str) -> bool: ...
+
+    @abstractmethod
+    async def get_many(
+        self,
+        pearl_ids: Sequence[str],
+        fields: Optional[Iterable[str]] = None,
+        category: Optional[str] = None,
+        in_stock_only: bool = False,
+    ) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def list_page(
+        self,
+        limit: int,
+        after: Optional[PageKey] = None,
+        category: Optional[str] = None,
+        in_stock_only: bool = True,
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Pearls ordered by (created_at, id), strictly after ``after``."""
+
+    @abstractmethod
+    def iter_all(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        exclude: Sequence[str] = (),
+        since: Optional[datetime] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every pearl, or those created/updated at or after ``since``."""
+
+    @abstractmethod
+    def iter_inline_images(self) -> AsyncIterator[Dict[str, Any]]:
+        """Stream ``{id, image}`` for pearls still carrying a data URI image."""
+
+    @abstractmethod
+    async def insert(self, pearl: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def insert_many(self, pearls: List[Dict[str, Any]]) -> None: ...
+
+    @abstractmethod
+    async def set_fields(self, pearl_id: str, values: Dict[str, Any]) -> bool: ...
+
+    @abstractmethod
+    async def bulk_upsert(self, pearls: List[Dict[str, Any]]) -> BulkUpsertResult:
+        """Upsert by id; existing pearls keep their created_at."""
+
+
+class CartRepository(ABC):
+    """One cart document per user; every mutation bumps ``version``."""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def create_if_missing(self, user_id: str, new_cart: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def add_item(self, user_id: str, item: Dict[str, Any], new_cart: Dict[str, Any]) -> None:
+        """Add ``item`` atomically: bump an existing line for the same pearl or
+        append it, creating the cart from ``new_cart`` if needed."""
+
+    @abstractmethod
+    async def remove_item(self, user_id: str, item_id: str) -> None: ...
+
+    @abstractmethod
+    async def set_quantity(self, user_id: str, item_id: str, quantity: int) -> bool: ...
+
+    @abstractmethod
+    async def update_items(self, user_id: str, transform: ItemsTransform, new_cart: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the cart's items with ``transform(items)`` as one atomic
+        write and return the updated cart. Exceptions raised by ``transform``
+        propagate and leave the cart untouched."""
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def get_by_email(self, email: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def create(self, user: Dict[str, Any]) -> None: ...
+
+
+class SessionRepository(ABC):
+    @abstractmethod
+    async def get(self, session_token: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def create(self, session: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def upsert(self, session: Dict[str, Any]) -> None:
+        """Store a session by token; an existing row keeps its id and created_at
+        and takes the new user and expiry."""
+
+    @abstractmethod
+    async def extend(self, session_token: str, expires_at: datetime) -> None: ...
+
+    @abstractmethod
+    async def delete_for_user(self, user_id: str) -> None: ...
+
+    @abstractmethod
+    async def trim_for_user(self, user_id: str, keep: int) -> List[str]:
+        """Delete all but the ``keep`` newest sessions of a user, returning the
+        deleted tokens."""
+
+    @abstractmethod
+    async def delete_expired(self, now: datetime, limit: int) -> int:
+        """Delete up to ``limit`` sessions that expired before ``now``."""
+
+    @abstractmethod
+    async def count(self) -> int: ...
+
+
+class Storage(ABC):
+    pearls: PearlRepository
+    carts: CartRepository
+    users: UserRepository
+    sessions: SessionRepository
+    images: Any
+
+    async def prepare(self) -> None:
+        """Called once on startup, e.g. to provision indexes."""
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def reset(self) -> None:
+        """Drop all data; used by benchmarks and load tests."""
+
+    async def index_report(self) -> Dict[str, Any]:
+        return {}
+
+
+# MongoDB implementation
+
+def _projection(fields: Optional[Iterable[str]] = None, exclude: Sequence[str] = ()) -> Dict[str, int]:
+    if fields is not None:
+        return {"_id": 0, **{name: 1 for name in fields}}
+    return {"_id": 0, **{name: 0 for name in exclude}}
+
+
+class MotorPearlRepository(PearlRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def count(self) -> int:
+        return await self.collection.count_documents({})
+
+    async def get(self, pearl_id, fields=None):
+        return await self.collection.find_one({"id": pearl_id}, _projection(fields))
+
+    async def exists(self, pearl_id):
+        return await self.collection.find_one({"id": pearl_id}, {"_id": 1}) is not None
+
+    async def get_many(self, pearl_ids, fields=None, category=None, in_stock_only=False):
+        query: Dict[str, Any] = {"id": {"$in": list(pearl_ids)}}
+        if category:
+            query["category"] = category
+        if in_stock_only:
+            query["in_stock"] = True
+        return await self.collection.find(query, _projection(fields)).to_list(None)
+
+    async def list_page(self, limit, after=None, category=None, in_stock_only=True, fields=None):
+        query: Dict[str, Any] = {}
+        if in_stock_only:
+            query["in_stock"] = True
+        if category:
+            query["category"] = category
+        if after:
+            created_at, pearl_id = after
+            query = {"$and": [query, {"$or": [
+                {"created_at": {"$gt": created_at}},
+                {"created_at": created_at, "id": {"$gt": pearl_id}},
+            ]}]}
+        cursor = self.collection.find(query, _projection(fields)).sort([("created_at", 1), ("id", 1)])
+        return await cursor.to_list(limit)
+
+    async def iter_all(self, fields=None, exclude=(), since=None):
+        query: Dict[str, Any] = {}
+        if since:
+            query["$or"] = [{"created_at": {"$gte": since}}, {"updated_at": {"$gte": since}}]
+        async for pearl in self.collection.find(query, _projection(fields, exclude), batch_size=500):
+            yield pearl
+
+    async def iter_inline_images(self):
+        async for pearl in self.collection.find({"image": {"$regex": "^data:"}}, {"_id": 0, "id": 1, "image": 1}):
+            yield pearl
+
+    async def insert(self, pearl):
+        await self.collection.insert_one(dict(pearl))
+
+    async def insert_many(self, pearls):
+        await self.collection.insert_many([dict(pearl) for pearl in pearls])
+
+    async def set_fields(self, pearl_id, values):
+        result = await self.collection.update_one({"id": pearl_id}, {"$set": values})
+        return result.matched_count > 0
+
+    async def bulk_upsert(self, pearls):
+        operations = [
+            UpdateOne(
+                {"id": pearl["id"]},
+                {
+                    "$set": {key: value for key, value in pearl.items() if key not in ("id", "created_at")},
+                    "$setOnInsert": {"created_at": pearl["created_at"]},
+                },
+                upsert=True,
+            )
+            for pearl in pearls
+        ]
+        errors = {}
+        try:
+            details = (await self.collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            errors = {error["index"]: error["errmsg"] for error in details["writeErrors"]}
+        return BulkUpsertResult(inserted=details["nUpserted"], updated=details["nMatched"], errors=errors)
+
+
+class MotorCartRepository(CartRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, user_id):
+        return await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+
+    async def create_if_missing(self, user_id, new_cart):
+        # Upsert so concurrent first visits cannot create two carts
+        await self.collection.update_one(
+            {"user_id": user_id},
+            {"$setOnInsert": {**new_cart, "items": [], "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    async def add_item(self, user_id, item, new_cart):
+        # A concurrent add can win the race to create the line; then $inc applies
+        for _ in range(3):
+            result = await self.collection.update_one(
+                {"user_id": user_id, "items.pearl_id": item["pearl_id"]},
+                {
+                    "$inc": {"items.$.quantity": item["quantity"], "version": 1},
+                    "$set": {"updated_at": datetime.now(timezone.utc)},
+                },
+            )
+            if result.matched_count:
+                return
+
+            try:
+                await self.collection.update_one(
+                    {"user_id": user_id, "items.pearl_id": {"$ne": item["pearl_id"]}},
+                    {
+                        "$push": {"items": item},
+                        "$inc": {"version": 1},
+                        "$set": {"updated_at": datetime.now(timezone.utc)},
+                        "$setOnInsert": new_cart,
+                    },
+                    upsert=True,
+                )
+                return
+            except DuplicateKeyError:
+                # The cart exists and already holds this pearl
+                continue
+
+        raise ConcurrentModification("Cart is being modified concurrently")
+
+    async def remove_item(self, user_id, item_id):
+        await self.collection.update_one(
+            {"user_id": user_id},
+            {
+                "$pull": {"items": {"id": item_id}},
+                "$inc": {"version": 1},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+            },
+        )
+
+    async def set_quantity(self, user_id, item_id, quantity):
+        result = await self.collection.update_one(
+            {"user_id": user_id, "items.id": item_id},
+            {
+                "$set": {"items.$.quantity": quantity, "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"version": 1},
+            },
+        )
+        return result.matched_count > 0
+
+
+    async def update_items(self, user_id, transform, new_cart):
+        # Optimistic concurrency: the write only lands if nobody bumped
+        # the version since we read the cart
+        for _ in range(3):
+            cart = await self.get(user_id)
+            if cart is None:
+                await self.create_if_missing(user_id, new_cart)
+                continue
+
+            items = transform([dict(item) for item in cart["items"]])
+            version = cart.get("version")
+            now = datetime.now(timezone.utc)
+            result = await self.collection.update_one(
+                {"user_id": user_id, "version": version if version is not None else {"$exists": False}},
+                {"$set": {"items": items, "updated_at": now}, "$inc": {"version": 1}},
+            )
+            if result.matched_count:
+                return {**cart, "items": items, "updated_at": now, "version": (version or 0) + 1}
+
+        raise ConcurrentModification("Cart is being modified concurrently")
+
+
+class MotorUserRepository(UserRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, user_id):
+        return await self.collection.find_one({"id": user_id}, {"_id": 0})
+
+    async def get_by_email(self, email):
+        return await self.collection.find_one({"email": email}, {"_id": 0})
+
+    async def create(self, user):
+        try:
+            await self.collection.insert_one(dict(user))
+        except DuplicateKeyError as e:
+            raise DuplicateEntry(str(e))
+
+
+class MotorSessionRepository(SessionRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, session_token):
+        return await self.collection.find_one({"session_token": session_token}, {"_id": 0})
+
+    async def create(self, session):
+        await self.collection.insert_one(dict(session))
+
+    async def upsert(self, session):
+        await self.collection.update_one(
+            {"session_token": session["session_token"]},
+            {
+                "$set": {"user_id": session["user_id"], "expires_at": session["expires_at"]},
+                "$setOnInsert": {"id": session["id"], "created_at": session["created_at"]},
+            },
+            upsert=True,
+        )
+
+    async def extend(self, session_token, expires_at):
+        await self.collection.update_one({"session_token": session_token}, {"$set": {"expires_at": expires_at}})
+
+    async def delete_for_user(self, user_id):
+        await self.collection.delete_many({"user_id": user_id})
+
+    async def trim_for_user(self, user_id, keep):
+        stale = self.collection.find({"user_id": user_id}, {"_id": 0, "session_token": 1})
+        stale = stale.sort([("created_at", -1)]).skip(keep)
+        tokens = [session["session_token"] async for session in stale]
+        if tokens:
+            await self.collection.delete_many({"user_id": user_id, "session_token": {"$in": tokens}})
+        return tokens
+
+    async def delete_expired(self, now, limit):
+        # delete_many has no limit, so pick a batch of _ids first to keep
+        # each delete short
+        expired = self.collection.find({"expires_at": {"$lt": now}}, {"_id": 1}).limit(limit)
+        ids = [session["_id"] async for session in expired]
+        if not ids:
+            return 0
+        result = await self.collection.delete_many({"_id": {"$in": ids}})
+        return result.deleted_count
+
+    async def count(self):
+        return await self.collection.estimated_document_count()
+
+
+class MotorStorage(Storage):
+    def __init__(self, mongo_url: str, db_name: str, event_listeners: Sequence[Any] = ()):
+        self.client = AsyncIOMotorClient(mongo_url, event_listeners=list(event_listeners))
+        self.db = self.client[db_name]
+        self.pearls = MotorPearlRepository(self.db.pearls)
+        self.carts = MotorCartRepository(self.db.carts)
+        self.users = MotorUserRepository(self.db.users)
+        self.sessions = MotorSessionRepository(self.db.user_sessions)
+        self.images = ImageStore(self.db)
+
+    async def prepare(self):
+        await ensure_indexes(self.db)
+
+    async def close(self):
+        self.client.close()
+
+    async def reset(self):
+        await self.client.drop_database(self.db.name)
+
+    async def index_report(self):
+        return await index_report(self.db)
+
+
+def create_storage(
+    backend: str,
+    mongo_url: Optional[str] = None,
+    db_name: Optional[str] = None,
+    event_listeners: Sequence[Any] = (),
+) -> Storage:
+    """``event_listeners`` are pymongo monitoring listeners; the memory backend ignores them."""
+    if backend == "mongo":
+        return MotorStorage(mongo_url, db_name, event_listeners)
+    if backend == "memory":
+        from memory_storage import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
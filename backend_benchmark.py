@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Pearl E-commerce Backend Benchmarks
+Micro-benchmarks for hot backend code paths, run against a scratch MongoDB database
+(or in memory with STORAGE_BACKEND=memory). Exits non-zero if a stress check fails.
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from catalog_search import CatalogSearchIndex  # noqa: E402
+from catalog_suggest import CatalogSuggestIndex  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+# Benchmarks write to their own database so they never touch real data
+BENCH_DB_NAME = os.environ.get("BENCH_DB_NAME", "pearl_benchmark")
+
+
+class PearlEcommerceBenchmark:
+    def __init__(self, repeat=50):
+        self.repeat = repeat
+        self.storage = create_storage(
+            os.environ.get("STORAGE_BACKEND", "mongo"), os.environ.get("MONGO_URL"), BENCH_DB_NAME
+        )
+        # The legacy baselines talk to Mongo directly and are skipped in memory
+        self.db = getattr(self.storage, "db", None)
+        self.results = []
+
+    def log_result(self, name, params, samples):
+        """Record latency samples (seconds) for one benchmark case"""
+        samples_ms = sorted(s * 1000 for s in samples)
+        result = {
+            "benchmark": name,
+            "params": params,
+            "runs": len(samples_ms),
+            "mean_ms": round(statistics.mean(samples_ms), 3),
+            "p50_ms": round(samples_ms[len(samples_ms) // 2], 3),
+            "p95_ms": round(samples_ms[int(len(samples_ms) * 0.95) - 1], 3),
+        }
+        self.results.append(result)
+        print(f"  {name} {params}: mean {result['mean_ms']}ms, p95 {result['p95_ms']}ms")
+
+    async def timed(self, func, *args):
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            await func(*args)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def timed_sync(self, func, *args, repeat=None):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            func(*args)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def make_pearls(self, count):
+        return [
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"Benchmark Pearl {i}",
+                "price": 100.0 + i,
+                "category": "akoya",
+                "image": "data:image/svg+xml;base64,PHN2Zy8+",
+                "description": "Benchmark pearl",
+                "size": "7mm",
+                "origin": "Japan",
+                "in_stock": True,
+                "created_at": datetime.now(timezone.utc),
+            }
+            for i in range(count)
+        ]
+
+    def make_catalog(self, count):
+        """Index-only pearls with varied names, categories and descriptions"""
+        finishes = ["Golden", "White", "Black", "Silver", "Rose", "Baroque", "Lustrous", "Deep", "Classic", "Rare"]
+        kinds = ["Akoya", "Tahitian", "South Sea", "Freshwater", "Keshi", "French Polynesian"]
+        shapes = ["Pearl", "Bar", "Strand", "Pendant", "Drop", "Stud", "Necklace", "Earrings"]
+        origins = ["Japan", "French Polynesia", "Australia", "China", "Indonesia", "Philippines"]
+        descriptions = [
+            "Lustrous pearl with a deep orient",
+            "Hand picked pearls on a silk strand",
+            "Classic round pearl necklace for evenings",
+            "Baroque shape with rose overtones",
+            "Cultured in calm lagoons",
+        ]
+        return [
+            {
+                "id": str(i),
+                "name": f"{finishes[i % 10]} {kinds[i // 10 % 6]} {shapes[i // 60 % 8]} {i % 4999}",
+                "category": kinds[i % 6].lower(),
+                "origin": origins[i % 7 % 6],
+                "description": descriptions[i % 5],
+                "in_stock": i % 10 != 0,
+            }
+            for i in range(count)
+        ]
+
+    async def seed_pearls(self, count):
+        pearls = self.make_pearls(count)
+        await self.storage.pearls.bulk_upsert([dict(pearl) for pearl in pearls])
+        return pearls
+
+    async def legacy_materialize_cart(self, items):
+        """The original get_cart loop: one find_one per cart item"""
+        cart_items = []
+        total = 0
+        for item in items:
+            pearl = await self.db.pearls.find_one({"id": item["pearl_id"]})
+            if pearl:
+                item_total = pearl["price"] * item["quantity"]
+                cart_items.append({
+                    "id": item["id"],
+                    "pearl": server.Pearl(**pearl),
+                    "quantity": item["quantity"],
+                    "total": item_total
+                })
+                total += item_total
+        return {
+            "items": cart_items,
+            "total": total,
+            "count": sum(item["quantity"] for item in items)
+        }
+
+    async def bench_cart_materialization(self, sizes=(1, 5, 10, 20, 50)):
+        """Cart pricing latency vs. cart size: N+1 lookups, one batched query, and projected shapes"""
+        print("\n=== Cart materialization ===")
+        pearls = await self.seed_pearls(max(sizes))
+        for size in sizes:
+            items = [
+                {"id": str(uuid.uuid4()), "pearl_id": pearl["id"], "quantity": 1}
+                for pearl in pearls[:size]
+            ]
+            if self.db is not None:
+                self.log_result("cart_materialization_legacy", {"items": size},
+                                await self.timed(self.legacy_materialize_cart, items))
+            self.log_result("cart_materialization_batched", {"items": size},
+                            await self.timed(server.materialize_cart, items))
+            self.log_result("cart_materialization_fields", {"items": size},
+                            await self.timed(server.materialize_cart, items, False, {"id", "name", "price", "thumbnail"}))
+            self.log_result("cart_materialization_summary", {"items": size},
+                            await self.timed(server.materialize_cart, items, True))
+
+    def bench_list_serialization(self, sizes=(100, 1000, 10000)):
+        """Pearl list serialization: double validation + stdlib json vs. model_construct + orjson"""
+        print("\n=== List serialization ===")
+        adapter = TypeAdapter(List[server.Pearl])
+
+        def legacy(docs):
+            # What get_pearls used to do: validate each doc, let FastAPI
+            # re-validate against List[Pearl], then encode with json.dumps
+            pearls = [server.Pearl(**doc) for doc in docs]
+            validated = adapter.validate_python([pearl.model_dump() for pearl in pearls])
+            return json.dumps(
+                jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+            ).encode("utf-8")
+
+        def fast(docs):
+            return server.render_json([server.pearl_from_db(doc) for doc in docs])
+
+        for size in sizes:
+            docs = self.make_pearls(size)
+            repeat = max(3, self.repeat * 100 // size)
+            self.log_result("list_serialization_legacy", {"items": size},
+                            self.timed_sync(legacy, docs, repeat=repeat))
+            self.log_result("list_serialization_fast", {"items": size},
+                            self.timed_sync(fast, docs, repeat=repeat))
+
+    def bench_search(self, count=100_000):
+        """Catalog search latency over a large catalog, broad and selective queries"""
+        print("\n=== Search ===")
+        index = CatalogSearchIndex()
+        self.log_result("search_build", {"pearls": count},
+                        self.timed_sync(index.rebuild, self.make_catalog(count), repeat=1))
+
+        queries = ("pearl", "pe", "akoya", "necklace", "akoya pearl", "golden akoya ne", "tahitian 42")
+        for query in queries:
+            self.log_result("search", {"pearls": count, "query": query},
+                            self.timed_sync(index.search, query, repeat=self.repeat * 10))
+        for query in ("pearl", "akoya pearl"):
+            self.log_result("search", {"pearls": count, "query": query, "category": "akoya"},
+                            self.timed_sync(lambda: index.search(query, category="akoya")))
+            self.log_result("search", {"pearls": count, "query": query, "offset": 400},
+                            self.timed_sync(lambda: index.search(query, offset=400)))
+
+    def bench_suggest(self, count=100_000):
+        """Autocomplete build, incremental add and query latency over a large catalog"""
+        print("\n=== Suggest ===")
+        pearls = self.make_catalog(count)
+
+        index = CatalogSuggestIndex()
+        self.log_result("suggest_build", {"pearls": count}, self.timed_sync(index.rebuild, pearls, repeat=1))
+
+        added = iter(range(count, count + self.repeat))
+        self.log_result("suggest_add", {"pearls": count}, self.timed_sync(
+            lambda: index.add({"id": str(next(added)), "name": "Golden Akoya Pendant", "category": "akoya",
+                               "origin": "Japan", "in_stock": True})
+        ))
+
+        queries = ("ak", "akoy", "tahition", "golden bar", "baroqe", "frensh poly", "pearl golden")
+        for query in queries:
+            # The first lookup of a prefix fills that trie node's cache
+            self.log_result("suggest_first", {"pearls": count, "query": query},
+                            self.timed_sync(index.suggest, query, repeat=1))
+        for query in queries:
+            self.log_result("suggest", {"pearls": count, "query": query},
+                            self.timed_sync(index.suggest, query, repeat=self.repeat * 10))
+
+        def write_then_suggest(query):
+            index.add(pearls[1])
+            index.suggest(query)
+
+        self.log_result("suggest_after_write", {"pearls": count, "query": "ak"},
+                        self.timed_sync(write_then_suggest, "ak"))
+
+    async def stress_concurrent_cart_adds(self, pearl_count=5, adds_per_pearl=40):
+        """Fire parallel add-to-cart calls and check no quantity update is lost"""
+        print("\n=== Concurrent cart adds ===")
+        pearls = await self.seed_pearls(pearl_count)
+        user_id = str(uuid.uuid4())
+        calls = [
+            server.add_cart_item(user_id, pearl["id"], 1)
+            for _ in range(adds_per_pearl)
+            for pearl in pearls
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - start
+
+        cart = await self.storage.carts.get(user_id)
+        # Mongo can also show a duplicate cart created by racing upserts
+        if self.db is not None:
+            cart_count = await self.db.carts.count_documents({"user_id": user_id})
+        else:
+            cart_count = 1 if cart else 0
+        quantities = {item["pearl_id"]: item["quantity"] for item in cart["items"]} if cart else {}
+        passed = (
+            cart_count == 1
+            and len(cart["items"]) == pearl_count
+            and all(quantities.get(pearl["id"]) == adds_per_pearl for pearl in pearls)
+        )
+        self.results.append({
+            "benchmark": "concurrent_cart_adds",
+            "params": {"pearls": pearl_count, "adds_per_pearl": adds_per_pearl},
+            "passed": passed,
+            "carts": cart_count,
+            "quantities": sorted(quantities.values()),
+            "elapsed_ms": round(elapsed * 1000, 3),
+        })
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"  {status}: {len(calls)} parallel adds -> {cart_count} cart(s), quantities {sorted(quantities.values())}")
+        return passed
+
+    async def stress_coalesced_reads(self, concurrency=500):
+        """Fire identical pearl detail reads at once and check they share one query"""
+        print("\n=== Coalesced catalog reads ===")
+        pearls = await self.seed_pearls(1)
+        server.bump_catalog_version()
+        before = server.pearl_detail_flights.stats()
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            server.get_pearl(pearls[0]["id"], if_none_match=None) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+        after = server.pearl_detail_flights.stats()
+
+        executions = after["executions"] - before["executions"]
+        bodies = {response.body for response in responses}
+        passed = executions == 1 and len(bodies) == 1
+        self.results.append({
+            "benchmark": "coalesced_reads",
+            "params": {"concurrency": concurrency},
+            "passed": passed,
+            "executions": executions,
+            "fan_in": concurrency / executions if executions else 0.0,
+            "elapsed_ms": round(elapsed * 1000, 3),
+        })
+        status = "✅ PASS" if passed else "❌ FAIL"
+        print(f"  {status}: {concurrency} concurrent reads -> {executions} query(ies) in {elapsed * 1000:.1f}ms")
+        return passed
+
+    async def run_all(self):
+        server.storage = self.storage
+        try:
+            await self.storage.prepare()
+            await self.bench_cart_materialization()
+            self.bench_list_serialization()
+            self.bench_search()
+            self.bench_suggest()
+            await self.stress_concurrent_cart_adds()
+            await self.stress_coalesced_reads()
+        finally:
+            await self.storage.reset()
+            await self.storage.close()
+        return self.results
+
+
+if __name__ == "__main__":
+    benchmark = PearlEcommerceBenchmark()
+    results = asyncio.run(benchmark.run_all())
+    output = os.environ.get("BENCH_OUTPUT", "bench_output.txt")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    # Stress checks record pass/fail; a regression must fail the run
+    failed = [result["benchmark"] for result in results if result.get("passed") is False]
+    if failed:
+        print(f"❌ Failed checks: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
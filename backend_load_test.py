@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Pearl E-commerce Backend Load Test
+Drives a concurrent mix of browse/search/detail/cart traffic against the API and
+reports per-route latency percentiles and throughput as JSON
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+import httpx
+
+# The load test owns its database; set it before server reads its config
+os.environ["DB_NAME"] = os.environ.get("LOAD_TEST_DB_NAME", "pearl_load_test")
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+CATEGORIES = ["akoya", "tahitian", "south-sea", "freshwater"]
+ORIGINS = ["Japan", "French Polynesia", "Australia", "China", "Indonesia"]
+WORDS = ["classic", "golden", "black", "baroque", "lustrous", "strand", "necklace",
+         "earrings", "ring", "bracelet", "pendant", "drop", "stud", "choker"]
+
+# Relative weight of each user action in the traffic mix
+SCENARIO_WEIGHTS = {
+    "browse": 35,
+    "search": 15,
+    "detail": 25,
+    "add_to_cart": 10,
+    "view_cart": 15,
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class PearlEcommerceLoadTest:
+    def __init__(self, base_url=None, users=50, duration=30.0, pearls=1000, seed=42):
+        self.base_url = base_url
+        self.users = users
+        self.duration = duration
+        self.pearl_count = pearls
+        self.random = random.Random(seed)
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.pearl_ids = []
+        self.tokens = []
+
+    def make_client(self):
+        if self.base_url:
+            return httpx.AsyncClient(base_url=self.base_url, timeout=30.0)
+        transport = httpx.ASGITransport(app=server.app)
+        return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30.0)
+
+    async def seed_sessions(self):
+        """Create one user and session per virtual user directly in storage"""
+        for i in range(self.users):
+            user = server.User(email=f"load-{i}-{uuid.uuid4().hex[:8]}@example.com", name=f"Load User {i}")
+            session = server.UserSession(
+                user_id=user.id,
+                session_token=uuid.uuid4().hex,
+                expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+            )
+            await server.storage.users.create(user.dict())
+            await server.storage.sessions.create(session.dict())
+            self.tokens.append(session.session_token)
+
+    async def seed_catalog(self, client):
+        """Load the catalog through the bulk import endpoint"""
+        lines = []
+        for i in range(self.pearl_count):
+            pearl_id = str(uuid.uuid4())
+            self.pearl_ids.append(pearl_id)
+            lines.append(json.dumps({
+                "id": pearl_id,
+                "name": " ".join(self.random.sample(WORDS, 3)).title() + f" Pearl {i}",
+                "price": round(self.random.uniform(50, 2500), 2),
+                "category": self.random.choice(CATEGORIES),
+                "image": "data:image/svg+xml;base64,PHN2ZyB4bWxucz0iaHR0cDovL3d3dy53My5vcmcvMjAwMC9zdmciLz4=",
+                "description": " ".join(self.random.choices(WORDS, k=12)),
+                "size": f"{self.random.randint(5, 14)}mm",
+                "origin": self.random.choice(ORIGINS),
+            }))
+        response = await client.post(
+            "/api/pearls/import",
+            content="\n".join(lines).encode(),
+            headers={"Authorization": f"Bearer {self.tokens[0]}", "Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+        report = response.json()
+        print(f"Seeded {report['inserted']} pearls at {report['rows_per_second']} rows/s")
+
+    async def request(self, client, route, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        self.samples[route].append(elapsed)
+        self.statuses[route][str(status)] += 1
+        if status == "error" or status >= 400:
+            self.errors[route] += 1
+
+    async def virtual_user(self, client, token, deadline):
+        auth = {"Authorization": f"Bearer {token}"}
+        scenarios = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        rng = random.Random(token)
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            if scenario == "browse":
+                params = {"limit": 20, "category": rng.choice(CATEGORIES + ["all"])}
+                await self.request(client, "GET /api/pearls", "GET", "/api/pearls", params=params)
+            elif scenario == "search":
+                params = {"search": rng.choice(WORDS)[: rng.randint(3, 8)], "limit": 20}
+                await self.request(client, "GET /api/pearls?search", "GET", "/api/pearls", params=params)
+            elif scenario == "detail":
+                url = f"/api/pearls/{rng.choice(self.pearl_ids)}"
+                await self.request(client, "GET /api/pearls/{id}", "GET", url)
+            elif scenario == "add_to_cart":
+                body = {"pearl_id": rng.choice(self.pearl_ids), "quantity": 1}
+                await self.request(client, "POST /api/cart/add", "POST", "/api/cart/add", json=body, headers=auth)
+            else:
+                await self.request(client, "GET /api/cart", "GET", "/api/cart", headers=auth)
+
+    def report(self, elapsed):
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            samples_ms = sorted(s * 1000 for s in samples)
+            routes[route] = {
+                "requests": len(samples_ms),
+                "errors": self.errors[route],
+                "statuses": dict(self.statuses[route]),
+                "throughput_rps": round(len(samples_ms) / elapsed, 2),
+                "mean_ms": round(sum(samples_ms) / len(samples_ms), 3),
+                "p50_ms": round(percentile(samples_ms, 50), 3),
+                "p95_ms": round(percentile(samples_ms, 95), 3),
+                "p99_ms": round(percentile(samples_ms, 99), 3),
+                "max_ms": round(samples_ms[-1], 3),
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            "config": {
+                "target": self.base_url or "in-process",
+                "users": self.users,
+                "duration_seconds": self.duration,
+                "pearls": self.pearl_count,
+                "mix": SCENARIO_WEIGHTS,
+            },
+            "elapsed_seconds": round(elapsed, 3),
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "throughput_rps": round(total / elapsed, 2),
+            "routes": routes,
+            # Shed counts only describe this process when the app runs in-process
+            "admission": None if self.base_url else {
+                name: budget.stats() for name, budget in server.admission_budgets.items()
+            },
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async def run(self):
+        await server.storage.reset()
+        await self.seed_sessions()
+        if not self.base_url:
+            await server.startup_db()
+        try:
+            async with self.make_client() as client:
+                await self.seed_catalog(client)
+                print(f"Running {self.users} users for {self.duration}s against {self.base_url or 'in-process app'}")
+                start = time.perf_counter()
+                deadline = start + self.duration
+                await asyncio.gather(*(self.virtual_user(client, token, deadline) for token in self.tokens))
+                elapsed = time.perf_counter() - start
+        finally:
+            if not self.base_url:
+                await server.shutdown_db_client()
+        return self.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--base-url",
+        help="Target a running server (e.g. http://localhost:8001) instead of the in-process app; "
+             "start it with DB_NAME set to the load test database so the seeded sessions resolve. "
+             "Set STORAGE_BACKEND=memory to profile the in-process app without MongoDB",
+    )
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to drive traffic")
+    parser.add_argument("--pearls", type=int, default=1000, help="Catalog size to seed")
+    parser.add_argument("--output", default="bench_output.txt", help="Where to write the JSON report")
+    args = parser.parse_args()
+    if args.base_url and os.environ.get("STORAGE_BACKEND") == "memory":
+        parser.error("--base-url needs a shared database; the memory backend only works in-process")
+
+    load_test = PearlEcommerceLoadTest(args.base_url, args.users, args.duration, args.pearls)
+    report = asyncio.run(load_test.run())
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'route':<28}{'req':>8}{'err':>6}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for route, stats in report["routes"].items():
+        print(f"{route:<28}{stats['requests']:>8}{stats['errors']:>6}{stats['throughput_rps']:>10}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"\nReport written to {args.output}")
+    return report["total_errors"] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
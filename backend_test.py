@@ -5,10 +5,16 @@ Tests all backend functionality including Pearl Management, Authentication, and
 """
 
 import requests
+import asyncio
 import json
 import sys
 import os
 from datetime import datetime
+from pathlib import Path
+
+# The import parser is checked in-process; its endpoint needs a logged-in user
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from bulk_import import RecordError, iter_records  # noqa: E402
 
 # Get backend URL from environment
 BACKEND_URL = "https://pearl-treasure.preview.emergentagent.com/api"
@@ -170,6 +176,16 @@ class PearlEcommerceAPITester:
         except Exception as e:
             self.log_test("GET /api/cart (unauthenticated)", False, "Request failed", str(e))
         
+        # Test GET /api/cart?view=summary without authentication
+        try:
+            response = self.session.get(f"{self.base_url}/cart", params={"view": "summary"})
+            if response.status_code == 401:
+                self.log_test("GET /api/cart?view=summary (unauthenticated)", True, "Correctly requires authentication")
+            else:
+                self.log_test("GET /api/cart?view=summary (unauthenticated)", False, f"Expected 401, got {response.status_code}")
+        except Exception as e:
+            self.log_test("GET /api/cart?view=summary (unauthenticated)", False, "Request failed", str(e))
+        
         # Test POST /api/cart/add without authentication
         if hasattr(self, 'test_pearl_id'):
             try:
@@ -201,6 +217,17 @@ class PearlEcommerceAPITester:
                 self.log_test("PUT /api/cart/{item_id} (unauthenticated)", False, f"Expected 401, got {response.status_code}")
         except Exception as e:
             self.log_test("PUT /api/cart/{item_id} (unauthenticated)", False, "Request failed", str(e))
+        
+        # Test POST /api/cart/batch without authentication
+        try:
+            batch = {"operations": [{"op": "remove", "item_id": "test_item_id"}]}
+            response = self.session.post(f"{self.base_url}/cart/batch", json=batch)
+            if response.status_code == 401:
+                self.log_test("POST /api/cart/batch (unauthenticated)", True, "Correctly requires authentication")
+            else:
+                self.log_test("POST /api/cart/batch (unauthenticated)", False, f"Expected 401, got {response.status_code}")
+        except Exception as e:
+            self.log_test("POST /api/cart/batch (unauthenticated)", False, "Request failed", str(e))
     
     def test_database_verification(self):
         """Test database connectivity and sample data"""
@@ -223,12 +250,12 @@ class PearlEcommerceAPITester:
                         missing = expected_categories - categories
                         self.log_test("Pearl Categories", False, f"Missing categories: {missing}")
                     
-                    # Check for base64 image data
-                    images_valid = all(pearl.get("image", "").startswith("data:image/") for pearl in pearls)
+                    # Check that images are served as URLs rather than inline base64
+                    images_valid = all(pearl.get("image", "") == f"/api/pearls/{pearl['id']}/image" for pearl in pearls)
                     if images_valid:
-                        self.log_test("Pearl Images", True, "All pearls have valid base64 image data")
+                        self.log_test("Pearl Images", True, "All pearls reference the image endpoint")
                     else:
-                        self.log_test("Pearl Images", False, "Some pearls missing valid image data")
+                        self.log_test("Pearl Images", False, "Some pearls missing image URLs")
                         
                 else:
                     self.log_test("Sample Pearl Data", False, f"Only found {len(pearls)} pearls, expected 4+")
@@ -237,6 +264,199 @@ class PearlEcommerceAPITester:
         except Exception as e:
             self.log_test("Sample Pearl Data", False, "Request failed", str(e))
     
+    def test_pearl_image_endpoint(self):
+        """Test binary image serving and conditional requests"""
+        print("\n=== Testing Pearl Image Endpoint ===")
+        
+        if not hasattr(self, 'test_pearl_id'):
+            self.log_test("GET /api/pearls/{id}/image", False, "No pearl available to test")
+            return
+        
+        try:
+            response = self.session.get(f"{self.base_url}/pearls/{self.test_pearl_id}/image")
+            etag = response.headers.get('ETag')
+            if response.status_code == 200 and response.headers.get('content-type', '').startswith('image/') and etag:
+                self.log_test("GET /api/pearls/{id}/image", True, f"Served {len(response.content)} bytes with ETag")
+            else:
+                self.log_test("GET /api/pearls/{id}/image", False, f"Status {response.status_code}", dict(response.headers))
+                return
+            
+            if response.headers.get('X-Content-Type-Options') == 'nosniff':
+                self.log_test("Image nosniff", True, "Content type cannot be sniffed into HTML")
+            else:
+                self.log_test("Image nosniff", False, "Missing X-Content-Type-Options: nosniff")
+            
+            response = self.session.get(f"{self.base_url}/pearls/{self.test_pearl_id}/image", headers={'If-None-Match': etag})
+            if response.status_code == 304:
+                self.log_test("Image If-None-Match", True, "Correctly returns 304 for matching ETag")
+            else:
+                self.log_test("Image If-None-Match", False, f"Expected 304, got {response.status_code}")
+        except Exception as e:
+            self.log_test("GET /api/pearls/{id}/image", False, "Request failed", str(e))
+        
+        try:
+            original = self.session.get(f"{self.base_url}/pearls/{self.test_pearl_id}/image")
+            thumbnail = self.session.get(f"{self.base_url}/pearls/{self.test_pearl_id}/image", params={"variant": "thumbnail"})
+            if thumbnail.status_code == 200 and len(thumbnail.content) <= len(original.content):
+                self.log_test("Image Thumbnail Variant", True, f"{len(thumbnail.content)} bytes vs {len(original.content)} original")
+            else:
+                self.log_test("Image Thumbnail Variant", False, f"Status {thumbnail.status_code}, {len(thumbnail.content)} bytes")
+            
+            response = self.session.get(f"{self.base_url}/pearls/{self.test_pearl_id}/image", params={"variant": "huge"})
+            if response.status_code == 422:
+                self.log_test("Image Unknown Variant", True, "Correctly rejects unknown variants")
+            else:
+                self.log_test("Image Unknown Variant", False, f"Expected 422, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Image Thumbnail Variant", False, "Request failed", str(e))
+    
+    def test_pearl_facets(self):
+        """Test GET /api/pearls/facets counts against the catalog listing"""
+        print("\n=== Testing Pearl Facets ===")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/pearls/facets")
+            facets = response.json() if response.status_code == 200 else {}
+            listed = self.session.get(f"{self.base_url}/pearls", params={"limit": 500}).json()
+            category_total = sum(facets.get("facets", {}).get("category", {}).values())
+            price_total = sum(bucket["count"] for bucket in facets.get("price", []))
+            if response.status_code != 200:
+                self.log_test("GET /api/pearls/facets", False, f"Expected 200, got {response.status_code}")
+            elif len(listed) < 500 and not facets["total"] == category_total == price_total == len(listed):
+                self.log_test("GET /api/pearls/facets", False,
+                              f"Totals disagree: facets {facets['total']}, categories {category_total}, "
+                              f"prices {price_total}, listing {len(listed)}")
+            else:
+                self.log_test("GET /api/pearls/facets", True, f"{facets['total']} in-stock pearls across {len(facets['facets']['category'])} categories")
+        except Exception as e:
+            self.log_test("GET /api/pearls/facets", False, "Request failed", str(e))
+    
+    def test_pearl_suggest(self):
+        """Test GET /api/pearls/suggest with prefixes and misspellings"""
+        print("\n=== Testing Pearl Suggest ===")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/pearls/suggest", params={"q": "akoy"})
+            suggestions = response.json() if response.status_code == 200 else []
+            if response.status_code != 200:
+                self.log_test("GET /api/pearls/suggest", False, f"Expected 200, got {response.status_code}")
+            elif not any("akoya" in suggestion["text"].lower() for suggestion in suggestions):
+                self.log_test("GET /api/pearls/suggest", False, f"No Akoya suggestion for 'akoy': {suggestions}")
+            else:
+                self.log_test("GET /api/pearls/suggest", True, f"{len(suggestions)} suggestions for 'akoy'")
+            
+            response = self.session.get(f"{self.base_url}/pearls/suggest", params={"q": "tahition"})
+            suggestions = response.json() if response.status_code == 200 else []
+            if any("tahitian" in suggestion["text"].lower() and suggestion["corrected"] for suggestion in suggestions):
+                self.log_test("Suggest Typo Correction", True, f"'tahition' -> {suggestions[0]['text']}")
+            else:
+                self.log_test("Suggest Typo Correction", False, f"No corrected Tahitian suggestion: {suggestions}")
+            
+            response = self.session.get(f"{self.base_url}/pearls", params={"search": "tahition"})
+            if response.status_code == 200 and response.json():
+                self.log_test("Search Typo Correction", True, f"'tahition' found {len(response.json())} pearls")
+            else:
+                self.log_test("Search Typo Correction", False, f"Misspelled search returned nothing ({response.status_code})")
+        except Exception as e:
+            self.log_test("GET /api/pearls/suggest", False, "Request failed", str(e))
+    
+    def test_csv_import_parsing(self):
+        """Test that a stray quote in a CSV cell does not swallow later rows"""
+        print("\n=== Testing CSV Import Parsing ===")
+        
+        lines = [
+            "name,description,price",
+            'Akoya Strand,Elegant 18" strand,450',
+            'Tahitian Drop,"Two-line',
+            'description with ""quotes""",300',
+            "Keshi Stud,Plain,120",
+        ]
+        
+        async def parse():
+            async def stream():
+                for line in lines:
+                    yield line
+            return [record async for _, record in iter_records(stream(), "csv")]
+        
+        try:
+            records = asyncio.run(parse())
+            errors = [record for record in records if isinstance(record, RecordError)]
+            names = [record.get("name") for record in records if not isinstance(record, RecordError)]
+            if errors or names != ["Akoya Strand", "Tahitian Drop", "Keshi Stud"]:
+                self.log_test("CSV Inch-Mark Row", False, f"Parsed {names}, errors {errors}")
+            elif records[0]["description"] != 'Elegant 18" strand' or '"quotes"' not in records[1]["description"]:
+                self.log_test("CSV Inch-Mark Row", False, f"Quotes mangled: {records}")
+            else:
+                self.log_test("CSV Inch-Mark Row", True, "Inch mark kept literally and later rows imported")
+        except Exception as e:
+            self.log_test("CSV Inch-Mark Row", False, "Parsing failed", str(e))
+    
+    def test_conditional_requests(self):
+        """Test ETag / If-None-Match handling on catalog endpoints"""
+        print("\n=== Testing Conditional Requests ===")
+        
+        urls = [("GET /api/pearls", f"{self.base_url}/pearls")]
+        if hasattr(self, 'test_pearl_id'):
+            urls.append(("GET /api/pearls/{id}", f"{self.base_url}/pearls/{self.test_pearl_id}"))
+        
+        for name, url in urls:
+            try:
+                response = self.session.get(url)
+                etag = response.headers.get('ETag')
+                if response.status_code != 200 or not etag:
+                    self.log_test(f"{name} ETag", False, f"Status {response.status_code}, ETag {etag}")
+                    continue
+                
+                response = self.session.get(url, headers={'If-None-Match': etag})
+                if response.status_code == 304 and not response.content:
+                    self.log_test(f"{name} ETag", True, "Returns 304 with empty body for current ETag")
+                else:
+                    self.log_test(f"{name} ETag", False, f"Expected 304, got {response.status_code}")
+            except Exception as e:
+                self.log_test(f"{name} ETag", False, "Request failed", str(e))
+    
+    def test_response_compression(self):
+        """Test that large JSON responses are compressed and images are not"""
+        print("\n=== Testing Response Compression ===")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/pearls", headers={'Accept-Encoding': 'gzip'})
+            encoding = response.headers.get('Content-Encoding')
+            if response.status_code == 200 and encoding == 'gzip' and 'Accept-Encoding' in response.headers.get('Vary', ''):
+                self.log_test("Catalog Compression", True, "GET /api/pearls is gzip encoded")
+            else:
+                self.log_test("Catalog Compression", False, f"Status {response.status_code}, Content-Encoding {encoding}")
+        except Exception as e:
+            self.log_test("Catalog Compression", False, "Request failed", str(e))
+        
+        if hasattr(self, 'test_pearl_id'):
+            try:
+                response = self.session.get(f"{self.base_url}/pearls/{self.test_pearl_id}/image", headers={'Accept-Encoding': 'gzip'})
+                content_type = response.headers.get('Content-Type', '')
+                encoding = response.headers.get('Content-Encoding')
+                if content_type.startswith('image/') and 'svg' not in content_type and encoding:
+                    self.log_test("Image Compression Skipped", False, f"{content_type} was re-encoded as {encoding}")
+                else:
+                    self.log_test("Image Compression Skipped", True, f"{content_type} served with Content-Encoding {encoding}")
+            except Exception as e:
+                self.log_test("Image Compression Skipped", False, "Request failed", str(e))
+    
+    def test_metrics_endpoint(self):
+        """Test the Prometheus metrics endpoint"""
+        print("\n=== Testing Metrics Endpoint ===")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/metrics")
+            body = response.text
+            expected = ["http_requests_total", "http_request_duration_seconds_bucket", "http_requests_in_flight"]
+            missing = [name for name in expected if name not in body]
+            if response.status_code == 200 and response.headers.get('Content-Type', '').startswith('text/plain') and not missing:
+                self.log_test("Metrics Endpoint", True, "Exposes request counters and latency histograms")
+            else:
+                self.log_test("Metrics Endpoint", False, f"Status {response.status_code}, missing {missing}")
+        except Exception as e:
+            self.log_test("Metrics Endpoint", False, "Request failed", str(e))
+    
     def test_api_response_validation(self):
         """Test API response formats and error handling"""
         print("\n=== Testing API Response Validation ===")
@@ -303,6 +523,13 @@ class PearlEcommerceAPITester:
         self.test_authentication_flow()
         self.test_shopping_cart_apis()
         self.test_database_verification()
+        self.test_pearl_image_endpoint()
+        self.test_pearl_facets()
+        self.test_pearl_suggest()
+        self.test_csv_import_parsing()
+        self.test_conditional_requests()
+        self.test_response_compression()
+        self.test_metrics_endpoint()
         self.test_api_response_validation()
         
         # Summary
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { View, Text, StyleSheet, ScrollView, TouchableOpacity, Image, Alert } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { StatusBar } from 'expo-status-bar';
@@ -12,6 +12,7 @@ interface CartItem {
     name: string;
     price: number;
     image: string;
+    thumbnail?: string | null;
     category: string;
   };
   quantity: number;
@@ -24,18 +25,48 @@ interface CartData {
   count: number;
 }
 
+interface CartOperation {
+  op: 'set' | 'remove';
+  item_id: string;
+  quantity?: number;
+}
+
+// Quantity taps within this window go to the server as one batch
+const CART_SYNC_DELAY_MS = 400;
+
+// Only the pearl attributes the cart list renders
+const CART_PEARL_FIELDS = 'name,price,category,thumbnail,image';
+
+// Images stored by the backend come back as relative URLs
+const imageUri = (url: string) => (url.startsWith('/') ? `${process.env.EXPO_PUBLIC_BACKEND_URL}${url}` : url);
+
+const withItems = (items: CartItem[]): CartData => ({
+  items,
+  total: items.reduce((sum, item) => sum + item.total, 0),
+  count: items.reduce((sum, item) => sum + item.quantity, 0),
+});
+
 export default function CartScreen() {
   const router = useRouter();
   const [cart, setCart] = useState<CartData>({ items: [], total: 0, count: 0 });
   const [loading, setLoading] = useState(true);
+  const pendingOperations = useRef<CartOperation[]>([]);
+  const syncTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
 
   useEffect(() => {
     loadCart();
+    return () => {
+      // Send edits still waiting on the timer before leaving the screen
+      if (syncTimer.current) {
+        clearTimeout(syncTimer.current);
+        syncCart();
+      }
+    };
   }, []);
 
   const loadCart = async () => {
     try {
-      const response = await fetch(`${process.env.EXPO_PUBLIC_BACKEND_URL}/api/cart`, {
+      const response = await fetch(`${process.env.EXPO_PUBLIC_BACKEND_URL}/api/cart?fields=${CART_PEARL_FIELDS}`, {
         credentials: 'include'
       });
       
@@ -50,23 +81,58 @@ export default function CartScreen() {
     }
   };
 
-  const updateQuantity = async (itemId: string, newQuantity: number) => {
+  const syncCart = async () => {
+    syncTimer.current = null;
+    const operations = pendingOperations.current;
+    pendingOperations.current = [];
+    if (operations.length === 0) {
+      return;
+    }
+
     try {
-      const response = await fetch(`${process.env.EXPO_PUBLIC_BACKEND_URL}/api/cart/${itemId}`, {
-        method: 'PUT',
+      const response = await fetch(`${process.env.EXPO_PUBLIC_BACKEND_URL}/api/cart/batch?fields=${CART_PEARL_FIELDS}`, {
+        method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         credentials: 'include',
-        body: JSON.stringify({ quantity: newQuantity }),
+        body: JSON.stringify({ operations }),
       });
 
       if (response.ok) {
+        setCart(await response.json());
+      } else {
         await loadCart();
       }
     } catch (error) {
       console.error('Error updating cart:', error);
+      await loadCart();
+    }
+  };
+
+  const queueOperation = (operation: CartOperation) => {
+    // Only the latest edit per line matters
+    pendingOperations.current = pendingOperations.current.filter((op) => op.item_id !== operation.item_id);
+    pendingOperations.current.push(operation);
+    if (syncTimer.current) {
+      clearTimeout(syncTimer.current);
     }
+    syncTimer.current = setTimeout(syncCart, CART_SYNC_DELAY_MS);
+  };
+
+  const updateQuantity = (itemId: string, newQuantity: number) => {
+    setCart((current) =>
+      withItems(
+        current.items
+          .filter((item) => item.id !== itemId || newQuantity > 0)
+          .map((item) =>
+            item.id === itemId
+              ? { ...item, quantity: newQuantity, total: item.pearl.price * newQuantity }
+              : item
+          )
+      )
+    );
+    queueOperation({ op: 'set', item_id: itemId, quantity: newQuantity });
   };
 
   const removeItem = async (itemId: string) => {
@@ -78,19 +144,9 @@ export default function CartScreen() {
         {
           text: 'Remove',
           style: 'destructive',
-          onPress: async () => {
-            try {
-              const response = await fetch(`${process.env.EXPO_PUBLIC_BACKEND_URL}/api/cart/${itemId}`, {
-                method: 'DELETE',
-                credentials: 'include',
-              });
-
-              if (response.ok) {
-                await loadCart();
-              }
-            } catch (error) {
-              console.error('Error removing item:', error);
-            }
+          onPress: () => {
+            setCart((current) => withItems(current.items.filter((item) => item.id !== itemId)));
+            queueOperation({ op: 'remove', item_id: itemId });
           },
         },
       ]
@@ -162,7 +218,7 @@ export default function CartScreen() {
       <ScrollView style={styles.itemsContainer} showsVerticalScrollIndicator={false}>
         {cart.items.map((item) => (
           <View key={item.id} style={styles.cartItem}>
-            <Image source={{ uri: item.pearl.image }} style={styles.itemImage} />
+            <Image source={{ uri: imageUri(item.pearl.thumbnail || item.pearl.image) }} style={styles.itemImage} />
             <View style={styles.itemDetails}>
               <Text style={styles.itemCategory}>{item.pearl.category.toUpperCase()}</Text>
               <Text style={styles.itemName}>{item.pearl.name}</Text>
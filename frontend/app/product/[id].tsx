@@ -154,7 +154,7 @@ export default function ProductDetailScreen() {
       <ScrollView style={styles.content} showsVerticalScrollIndicator={false}>
         {/* Product Image */}
         <View style={styles.imageContainer}>
-          <Image source={{ uri: pearl.image }} style={styles.productImage} />
+          <Image source={{ uri: pearl.image.startsWith('/') ? `${process.env.EXPO_PUBLIC_BACKEND_URL}${pearl.image}` : pearl.image }} style={styles.productImage} />
           <View style={styles.categoryBadge}>
             <Text style={styles.categoryText}>{pearl.category.toUpperCase()}</Text>
           </View>